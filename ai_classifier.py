@@ -0,0 +1,179 @@
+import re
+import time
+import asyncio
+import hashlib
+import logging
+
+logger = logging.getLogger("AIClassifier")
+
+# --- HUGGINGFACE CLASSIFIER (CACHE + MICRO-BATCHES) ---
+# Раньше каждый чистый не-RU источник давал отдельный POST с таймаутом 8с,
+# и одни и те же сниппеты классифицировались заново в каждом запуске.
+# Теперь:
+#   - вердикт кешируется в crawl_state по хешу нормализованного сниппета
+#     (регистр, пробелы, uuid/IP не влияют на ключ), с TTL;
+#   - одинаковые сниппеты в полёте ждут один общий ответ;
+#   - промахи кеша копятся до AI_BATCH_SIZE или AI_BATCH_WAIT и уходят
+#     одним запросом со списком inputs.
+
+AI_CACHE_TTL = 14 * 86400
+AI_BATCH_SIZE = 8
+AI_BATCH_WAIT = 0.2          # секунд ждём, пока соберётся пачка
+AI_TIMEOUT = 8
+AI_MAX_NEW_TOKENS = 25
+
+SNIPPET_CHARS = 700
+
+_UUID_REGEX = re.compile(r'[a-f0-9]{8}-?[a-f0-9]{4}-?[a-f0-9]{4}-?[a-f0-9]{4}-?[a-f0-9]{12}')
+_IP_REGEX = re.compile(r'\b\d{1,3}(?:\.\d{1,3}){3}\b')
+_SPACE_REGEX = re.compile(r'\s+')
+
+
+def normalize_snippet(snippet):
+    text = snippet[:SNIPPET_CHARS].lower()
+    text = _UUID_REGEX.sub("<uuid>", text)
+    text = _IP_REGEX.sub("<ip>", text)
+    return _SPACE_REGEX.sub(" ", text).strip()
+
+
+def snippet_key(snippet):
+    return hashlib.sha1(normalize_snippet(snippet).encode("utf-8")).hexdigest()
+
+
+def build_prompt(snippet):
+    return f"""Analyze this text. Is it a 'Guide/Tutorial', 'Spam', 'RU VPN Config', or 'Global VPN Config'?
+Look for Russian SNI (gosuslugi, yandex, etc) or Russian text.
+If it contains donation links but has configs, it is a Config, not spam.
+Format: "Verdict: [RU/Global/Spam/Guide] Reason: [reason]"
+Snippet: {snippet[:SNIPPET_CHARS]}"""
+
+
+def parse_verdict(text):
+    text = text.lower()
+    if "guide" in text or "tutorial" in text:
+        return "guide", "AI detected guide"
+    if "spam" in text:
+        return "spam", "AI detected spam"
+    if "ru" in text:
+        return "ru", "AI detected RU context"
+    if "global" in text:
+        return "global", "AI says Global"
+    return "unknown", text
+
+
+def _generated_texts(res, expected):
+    """Ответ text-generation: [{...}] на одну строку, [[{...}], ...] на список."""
+    if not isinstance(res, list) or len(res) != expected:
+        return None
+    texts = []
+    for item in res:
+        if isinstance(item, list):
+            item = item[0] if item else {}
+        texts.append(item.get("generated_text", "") if isinstance(item, dict) else "")
+    return texts
+
+
+class HFClassifier:
+    def __init__(self, session, api_url, token, state=None, concurrency=3):
+        self.session = session
+        self.api_url = api_url
+        self.token = token
+        self.state = state
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self._queue = []
+        self._inflight = {}
+        self._flush_task = None
+        # Ссылки на отправки в полёте: задачу без ссылки сборщик мусора
+        # может убрать на середине, и её фьючерсы не дождутся ответа
+        self._send_tasks = set()
+        self.hits = 0
+        self.misses = 0
+        self.batches = 0
+        self.errors = 0
+        self.latencies = []
+
+    async def classify(self, snippet):
+        """(verdict, reason): guide / spam / ru / global / unknown."""
+        if not self.token:
+            return "unknown", "No Token"
+
+        key = snippet_key(snippet)
+        if self.state is not None:
+            cached = self.state.get_ai_verdict(key, AI_CACHE_TTL)
+            if cached is not None:
+                self.hits += 1
+                return cached
+        if key in self._inflight:
+            self.hits += 1
+            return await asyncio.shield(self._inflight[key])
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        self._queue.append((key, snippet, future))
+        if len(self._queue) >= AI_BATCH_SIZE:
+            self._flush()
+        elif self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_later())
+        return await asyncio.shield(future)
+
+    async def _flush_later(self):
+        await asyncio.sleep(AI_BATCH_WAIT)
+        self._flush_task = None
+        self._flush()
+
+    def _flush(self):
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        batch, self._queue = self._queue, []
+        if batch:
+            task = asyncio.create_task(self._send(batch))
+            self._send_tasks.add(task)
+            task.add_done_callback(self._send_tasks.discard)
+
+    async def _send(self, batch):
+        prompts = [build_prompt(snippet) for _, snippet, _ in batch]
+        results = None
+        async with self.semaphore:
+            started = time.perf_counter()
+            try:
+                payload = {
+                    "inputs": prompts[0] if len(prompts) == 1 else prompts,
+                    "parameters": {"max_new_tokens": AI_MAX_NEW_TOKENS, "return_full_text": False}
+                }
+                headers = {"Authorization": f"Bearer {self.token}"}
+                async with self.session.post(self.api_url, headers=headers, json=payload,
+                                             timeout=AI_TIMEOUT) as resp:
+                    if resp.status == 200:
+                        results = _generated_texts(await resp.json(), len(batch))
+            except Exception:
+                pass
+            self.latencies.append(time.perf_counter() - started)
+        self.batches += 1
+
+        if results is None:
+            self.errors += 1
+        for i, (key, _, future) in enumerate(batch):
+            self._inflight.pop(key, None)
+            if results is None:
+                verdict = ("unknown", "Error")
+            else:
+                verdict = parse_verdict(results[i])
+                if self.state is not None:
+                    self.state.put_ai_verdict(key, *verdict)
+            if not future.done():
+                future.set_result(verdict)
+
+    def log_summary(self):
+        total = self.hits + self.misses
+        if not total:
+            return
+        lat = sorted(self.latencies)
+        p50 = lat[len(lat) // 2] if lat else 0
+        p95 = lat[min(len(lat) - 1, int(len(lat) * 0.95))] if lat else 0
+        logger.info(
+            f"🤖 AI cache: {self.hits}/{total} hits ({self.hits / total:.0%}), "
+            f"{self.batches} batches for {self.misses} misses, {self.errors} failed, "
+            f"latency p50 {p50 * 1000:.0f} ms / p95 {p95 * 1000:.0f} ms"
+        )
@@ -0,0 +1,98 @@
+"""
+Память и скорость дедупликации: set строк против bloom.BloomSet.
+
+Для трёх видов ключей scout (URL, md5 контента, отпечатки нод) строит
+set, BloomSet и BloomSet(exact=True) на --n элементах и печатает по строке
+JSON: байт на элемент (tracemalloc, строки ключей тоже считаются — set их
+держит, Bloom нет), нс на add / попадание / промах и фактический процент
+ложных срабатываний.
+
+    python benchmarks/bench_bloom.py [--n 1000000] [--fp 1e-4]
+"""
+import os
+import sys
+import json
+import time
+import random
+import hashlib
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bloom import BloomSet
+
+MISS_SAMPLE = 200_000
+
+
+def keys(kind, n, seed):
+    rng = random.Random(f"{kind}-{seed}")
+    for i in range(n):
+        if kind == "url":
+            # seed в пути: ключи разных seed не совпадают (промахи — настоящие)
+            yield (f"https://raw.githubusercontent.com/user{rng.randrange(50000)}/repo{seed}-{i}"
+                   f"/main/sub{rng.randrange(100)}.txt")
+        elif kind == "content_hash":
+            yield hashlib.md5(f"{seed}-{i}".encode()).hexdigest()
+        else:
+            uuid = "%08x-%04x-%04x-%04x-%012x" % tuple(rng.getrandbits(b) for b in (32, 16, 16, 16, 48))
+            yield f"{uuid}:{rng.getrandbits(256):064x}"
+
+
+def make(impl, n, fp):
+    if impl == "set":
+        return set()
+    return BloomSet(n, fp, exact=(impl == "bloom_exact"))
+
+
+def measure_memory(impl, kind, n, fp):
+    tracemalloc.start()
+    s = make(impl, n, fp)
+    for key in keys(kind, n, 0):
+        s.add(key)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return s, size
+
+
+def per_op_ns(fn, items):
+    started = time.perf_counter()
+    for item in items:
+        fn(item)
+    return (time.perf_counter() - started) / len(items) * 1e9
+
+
+def bench(impl, kind, n, fp):
+    s, size = measure_memory(impl, kind, n, fp)
+    hits = list(keys(kind, min(n, MISS_SAMPLE), 0))
+    misses = list(keys(kind, MISS_SAMPLE, 1))
+
+    fresh = make(impl, n, fp)
+    add_keys = list(keys(kind, min(n, MISS_SAMPLE), 2))
+    return {
+        "impl": impl,
+        "kind": kind,
+        "n": n,
+        "bytes_per_item": round(size / n, 1),
+        "mb": round(size / 2 ** 20, 1),
+        "add_ns": round(per_op_ns(fresh.add, add_keys)),
+        "hit_ns": round(per_op_ns(s.__contains__, hits)),
+        "miss_ns": round(per_op_ns(s.__contains__, misses)),
+        "false_positive": sum(1 for key in misses if key in s) / len(misses),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=1_000_000)
+    parser.add_argument("--fp", type=float, default=1e-4)
+    parser.add_argument("--kinds", default="url,content_hash,fingerprint")
+    args = parser.parse_args()
+
+    for kind in args.kinds.split(","):
+        for impl in ("set", "bloom", "bloom_exact"):
+            print(json.dumps(bench(impl, kind, args.n, args.fp)), flush=True)
+
+
+if __name__ == "__main__":
+    main()
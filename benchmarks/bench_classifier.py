@@ -0,0 +1,118 @@
+"""
+Точность и скорость локального классификатора (classifier.py).
+
+На корпусе train_classifier.py (corpus.jsonl), если он есть, иначе на
+синтетических сниппетах (с долей неоднозначных: ноды RU и Global вперемешку,
+заголовок-инструкция над настоящим конфигом). Обучение и калибровка на 80%,
+проверка на 20%: общая точность, доля уверенных ответов и точность на них —
+это та часть, что больше не уходит в удалённую модель; для сравнения то же
+для сырой вероятности NB с порогом CONFIDENT, и кривая уверенность — точность
+на проверочной части. Скорость — predict_batch, сниппетов/сек.
+
+    python benchmarks/bench_classifier.py [--corpus corpus.jsonl] [--rounds 5]
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from classifier import CONFIDENT, confidence_curve, fit_calibrated
+
+RU_SNI = ["gosuslugi.ru", "yandex.ru", "vk.com", "ozon.ru", "sberbank.ru", "mail.ru"]
+GLOBAL_SNI = ["www.microsoft.com", "dl.google.com", "www.speedtest.net", "cdn.discordapp.com"]
+GUIDE_HEADS = ["Инструкция: как настроить v2ray", "How to install xray, step 1", "Руководство по установке"]
+AMBIGUOUS = 0.15        # доля конфигов с нодами обоих видов
+GUIDED_CONFIGS = 0.1    # доля конфигов с заголовком-инструкцией
+
+
+def make_snippet(rng, label):
+    uuid = "%08x-%04x-%04x-%04x-%012x" % tuple(rng.getrandbits(b) for b in (32, 16, 16, 16, 48))
+    ip = ".".join(str(rng.randint(1, 254)) for _ in range(4))
+    if label == "guide":
+        head = rng.choice(GUIDE_HEADS)
+    elif label == "spam":
+        head = rng.choice(["Купить VPN, цена 199 руб, подпишись t.me/vpn", "Buy premium, price $3, donate patreon"])
+    elif rng.random() < GUIDED_CONFIGS:
+        head = rng.choice(GUIDE_HEADS)
+    else:
+        head = rng.choice(["# profile-title: free", "#subscription", ""])
+    pool = RU_SNI if label == "ru" else GLOBAL_SNI
+    if label in ("ru", "global") and rng.random() < AMBIGUOUS:
+        pool = RU_SNI + GLOBAL_SNI
+    links = [f"vless://{uuid}@{ip}:443?security=reality&sni={rng.choice(pool)}&type=grpc#node"
+             for _ in range(rng.randint(1, 5))]
+    return f"{head}\n" + "\n".join(links)
+
+
+def synthetic_corpus(n, seed=0):
+    rng = random.Random(seed)
+    labels = ["ru"] * 5 + ["global"] * 3 + ["guide", "spam"]
+    return [{"label": label, "text": make_snippet(rng, label)}
+            for label in (rng.choice(labels) for _ in range(n))]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus", default="corpus.jsonl")
+    parser.add_argument("--synthetic", type=int, default=5000, help="размер синтетики без корпуса")
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    if os.path.exists(args.corpus):
+        with open(args.corpus, "r", encoding="utf-8") as f:
+            samples = [json.loads(line) for line in f if line.strip()]
+        source = args.corpus
+    else:
+        samples = synthetic_corpus(args.synthetic)
+        source = "synthetic"
+
+    random.Random(1).shuffle(samples)
+    split = int(len(samples) * 0.8)
+    train, test = samples[:split], samples[split:]
+
+    started = time.perf_counter()
+    model, _ = fit_calibrated([s["text"] for s in train], [s["label"] for s in train])
+    fit_time = time.perf_counter() - started
+
+    texts = [s["text"] for s in test]
+    labels = [s["label"] for s in test]
+    held_scores = [model.scores(text) for text in texts]
+    raw = confidence_curve(held_scores, labels, 1.0)
+    curve = confidence_curve(held_scores, labels, model.temperature)
+    correct = sum(1 for (label, _), s in zip(model.predict_batch(texts), test) if label == s["label"])
+
+    best = float("inf")
+    for _ in range(args.rounds):
+        started = time.perf_counter()
+        model.predict_batch(texts)
+        best = min(best, time.perf_counter() - started)
+
+    def at(curve, threshold):
+        """(доля, точность) ответов с уверенностью >= threshold."""
+        covered, accuracy = 0, 0.0
+        for confidence, n, acc in curve:
+            if confidence >= threshold:
+                covered, accuracy = n, acc
+        return covered / len(test), accuracy
+
+    print(f"corpus: {source}, train {len(train)}, test {len(test)}, fit+calibrate {fit_time:.2f}s")
+    print(f"accuracy:            {correct / len(test):.1%}")
+    share, accuracy = at(raw, CONFIDENT)
+    print(f"raw NB (>={CONFIDENT}):    {share:.1%} of snippets confident, accuracy {accuracy:.1%}")
+    share, accuracy = at(curve, model.threshold)
+    print(f"calibrated (T={model.temperature:.1f}, >={model.threshold:.3f}): "
+          f"{share:.1%} of snippets confident, accuracy {accuracy:.1%}")
+    print("curve (threshold: share, accuracy):")
+    for threshold in (0.99, 0.95, 0.9, 0.8, 0.7, 0.5):
+        share, accuracy = at(curve, threshold)
+        print(f"  {threshold:.2f}: {share:6.1%}  {accuracy:6.1%}")
+    print(f"throughput:          {len(texts) / best:,.0f} snippets/s "
+          f"({best / len(texts) * 1e6:.0f} us/snippet)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+"""
+Офлайн-бенчмарк конвейеров scout и cleaner на локальном стенде (mock_server.py).
+
+Поднимает стенд отдельным процессом, прогоняет через него:
+  scout   — Frontier + scout.worker / fetch_and_analyze (без GitHub-поиска и AI),
+  cleaner — cleaner.run_checks (check_url + история живости),
+и печатает по строке JSON на конвейер: URL/сек, мс анализа на документ,
+пиковый RSS (каждый конвейер — в своём процессе), задержка event loop
+(p50/p99/max). В строке есть коммит и параметры корпуса — результаты
+сравнимы между коммитами:
+
+    python benchmarks/bench_pipeline.py [--pipeline scout|cleaner|all] [--pool] [--profile] [--out results.jsonl]
+"""
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import logging
+import argparse
+import resource
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import scout
+import cleaner
+from mock_server import Corpus, CORPUS_MIX
+from crawl_state import CrawlState
+from frontier import Frontier
+from probing import Prober
+from list_writer import ListJournal
+from ai_classifier import HFClassifier
+from http_client import create_session
+from profiler import LoopLag, Profiler
+
+
+def peak_rss_mb():
+    """Пик RSS этого процесса (каждый конвейер идёт в своём, см. run_pipeline)."""
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def wait_for_port(port, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError(f"mock server did not start on port {port}")
+
+
+def timed_analysis(timings):
+    """Обёртка scout.run_analysis, копящая время анализа на документ."""
+    original = scout.run_analysis
+
+    async def run_analysis(content, url_clean, depth):
+        started = time.perf_counter()
+        try:
+            return await original(content, url_clean, depth)
+        finally:
+            timings.append(time.perf_counter() - started)
+
+    return original, run_analysis
+
+
+async def bench_scout(corpus, workdir, use_pool, profile=False):
+    scout.PROFILER = Profiler() if profile else None
+    scout.CRAWL_STATE = CrawlState(os.path.join(workdir, "crawl_state.db"))
+    scout.PROBER = Prober(None)
+    scout.NODE_STORE = None
+    scout.LOCAL_MODEL = None
+    scout.QUERY_PLANNER = None
+    scout.RU_JOURNAL = ListJournal(os.path.join(workdir, "verified_ru.txt"))
+    scout.POTENTIAL_JOURNAL = ListJournal(os.path.join(workdir, "potential_mixed.txt"))
+    await scout.RU_JOURNAL.start()
+    await scout.POTENTIAL_JOURNAL.start()
+    if use_pool:
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        scout.ANALYSIS_POOL = ProcessPoolExecutor(
+            max_workers=scout.ANALYSIS_WORKERS, mp_context=multiprocessing.get_context("spawn")
+        )
+    else:
+        scout.ANALYSIS_POOL = None
+
+    timings = []
+    original, scout.run_analysis = timed_analysis(timings)
+    lag = LoopLag()
+    try:
+        async with create_session(limit=scout.CONCURRENCY_LIMIT * 2,
+                                  limit_per_host=scout.CONCURRENCY_LIMIT * 2) as session:
+            scout.AI_CLASSIFIER = HFClassifier(session, scout.HF_API_URL, None)
+            # Стенд — один хост, так что лимит на хост не должен быть узким местом
+            queue = Frontier(host_active_limit=scout.CONCURRENCY_LIMIT)
+            for url in corpus.urls():
+                queue.put_nowait((url, "bench", 0), "seed")
+
+            lag.start()
+            if scout.PROFILER is not None:
+                scout.PROFILER.start()
+            started = time.perf_counter()
+            workers = [asyncio.create_task(scout.worker(queue, session)) for _ in range(scout.CONCURRENCY_LIMIT)]
+            await queue.join()
+            elapsed = time.perf_counter() - started
+            for w in workers:
+                w.cancel()
+            lag.stop()
+            if scout.PROFILER is not None:
+                scout.PROFILER.stop()
+                # Топы профилировщика — в stderr, строка результата остаётся компактной
+                print(json.dumps(scout.PROFILER.report(), ensure_ascii=False, indent=1), file=sys.stderr)
+        await scout.RU_JOURNAL.finish()
+        await scout.POTENTIAL_JOURNAL.finish()
+    finally:
+        scout.run_analysis = original
+        scout.CRAWL_STATE.close()
+        if scout.ANALYSIS_POOL is not None:
+            scout.ANALYSIS_POOL.shutdown(cancel_futures=True)
+
+    fetched = scout.stats["total_fetched"]
+    return {
+        "urls": fetched,
+        "seconds": round(elapsed, 2),
+        "urls_per_s": round(fetched / elapsed, 1),
+        "analysis_ms_per_doc": round(sum(timings) / len(timings) * 1000, 3) if timings else 0,
+        "analysed_docs": len(timings),
+        "clean": scout.RU_JOURNAL.count + scout.POTENTIAL_JOURNAL.count,
+        **lag.summary(),
+    }
+
+
+async def bench_cleaner(corpus, workdir):
+    urls = corpus.urls()
+    state = CrawlState(os.path.join(workdir, "cleaner_state.db"))
+    lag = LoopLag()
+    try:
+        async with create_session(limit=cleaner.CONCURRENCY, limit_per_host=cleaner.CONCURRENCY) as session:
+            lag.start()
+            started = time.perf_counter()
+            results = await cleaner.run_checks(session, urls, state)
+            elapsed = time.perf_counter() - started
+            lag.stop()
+    finally:
+        state.close()
+    # Один провал URL не убивает (история живости), поэтому считаем подтверждённо живые
+    healthy = sum(1 for r in results if r is not None and r[2] is not None)
+    return {
+        "urls": len(urls),
+        "seconds": round(elapsed, 2),
+        "urls_per_s": round(len(urls) / elapsed, 1),
+        "healthy": healthy,
+        **lag.summary(),
+    }
+
+
+async def run_child(args):
+    """Один конвейер в этом процессе; строка результата — в stdout."""
+    corpus = Corpus(args.seed, f"http://127.0.0.1:{args.port}")
+    with tempfile.TemporaryDirectory() as workdir:
+        if args.child == "scout":
+            result = await bench_scout(corpus, workdir, args.pool, args.profile)
+        else:
+            result = await bench_cleaner(corpus, workdir)
+    print(json.dumps({**result, "peak_rss_mb": peak_rss_mb()}, ensure_ascii=False))
+
+
+def run_pipeline(name, port, args):
+    """
+    Конвейер в отдельном процессе: ru_maxrss — пик за всю жизнь процесса,
+    и в общем процессе строка cleaner показывала бы пик scout.
+    """
+    command = [sys.executable, os.path.abspath(__file__), "--child", name,
+               "--port", str(port), "--seed", str(args.seed)]
+    if args.pool:
+        command.append("--pool")
+    if args.profile:
+        command.append("--profile")
+    output = subprocess.run(command, stdout=subprocess.PIPE, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pipeline", choices=["scout", "cleaner", "all"], default="all")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--pool", action="store_true", help="анализ scout в пуле процессов")
+    parser.add_argument("--profile", action="store_true", help="scout с профилировщиком (его накладные расходы)")
+    parser.add_argument("--out", help="дописать результаты (JSONL) в файл")
+    # Внутреннее: прогон одного конвейера против уже поднятого стенда
+    parser.add_argument("--child", choices=["scout", "cleaner"], help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    if args.child:
+        await run_child(args)
+        return
+
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "mock_server.py"),
+         "--port", str(port), "--seed", str(args.seed)]
+    )
+    rows = []
+    try:
+        await wait_for_port(port)
+        base = {"commit": git_commit(), "seed": args.seed, "corpus": CORPUS_MIX, "time": int(time.time())}
+        pipelines = ["scout", "cleaner"] if args.pipeline == "all" else [args.pipeline]
+        for name in pipelines:
+            result = run_pipeline(name, port, args)
+            rows.append({**base, "pipeline": name, "pool": args.pool if name == "scout" else None,
+                         "profile": args.profile if name == "scout" else None, **result})
+            print(json.dumps(rows[-1], ensure_ascii=False))
+    finally:
+        server.terminate()
+        server.wait()
+
+    if args.out:
+        with open(args.out, "a", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
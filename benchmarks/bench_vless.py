@@ -0,0 +1,113 @@
+"""
+Пропускная способность разбора vless-ссылок: ссылок/сек до и после.
+
+"До" — старая схема из analyze_document: LINK_MATCHER по сырой строке,
+UUID_REGEX и две регулярки extract_vless_fingerprint. "После" — один
+проход vless.parse_vless и фильтры по полям VlessNode, как в scout.py.
+
+    python benchmarks/bench_vless.py [--links 1000000]
+"""
+import os
+import re
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import scout
+from matcher import KeywordMatcher
+from vless import parse_vless
+
+LEGACY_LINK_MATCHER = KeywordMatcher({
+    "transport": ["security=reality", "type=grpc"],
+    "black": scout.BLACK_SNI,
+    "placeholder": scout.PLACEHOLDER_STRINGS,
+    "white": scout.WHITE_SNI,
+})
+LEGACY_UUID_REGEX = re.compile(r'(?P<uuid>[a-f0-9\-]{32,36})@', re.I)
+LEGACY_PBK_REGEX = re.compile(
+    r'vless://(?P<uuid>[a-zA-Z0-9\-]+)@.*?(?:\?|&)(?:pbk|publickey)=(?P<pbk>[a-zA-Z0-9%\-\_]+)',
+    re.IGNORECASE
+)
+LEGACY_HOST_REGEX = re.compile(r'vless://(?P<uuid>[a-zA-Z0-9\-]+)@(?P<host>[^:]+)')
+
+SNIS = ["www.yandex.ru", "vk.com", "gosuslugi.ru", "www.microsoft.com", "dl.google.com", "ozon.ru"]
+
+
+def make_links(n, seed=0):
+    rng = random.Random(seed)
+    links = []
+    for i in range(n):
+        uuid = "%08x-%04x-%04x-%04x-%012x" % tuple(rng.getrandbits(b) for b in (32, 16, 16, 16, 48))
+        host = ".".join(str(rng.randint(1, 254)) for _ in range(4))
+        sni = rng.choice(SNIS)
+        transport = rng.choice(["security=reality&type=tcp", "security=reality&type=grpc", "security=tls&type=ws"])
+        links.append(
+            f"vless://{uuid}@{host}:{rng.choice([443, 8443, 2053])}?encryption=none&{transport}"
+            f"&sni={sni}&fp=chrome&pbk={rng.getrandbits(128):032x}&sid={i % 256:02x}"
+            f"&flow=xtls-rprx-vision#node-{i}"
+        )
+    return links
+
+
+def legacy(links):
+    out = []
+    for link in links:
+        hits = LEGACY_LINK_MATCHER.scan(link)
+        if "transport" not in hits or "black" in hits or "placeholder" in hits:
+            continue
+        uuid_match = LEGACY_UUID_REGEX.search(link)
+        if uuid_match:
+            uuid = uuid_match.group('uuid').replace('-', '')
+            if len(uuid) != 32 or len(set(uuid)) < 5:
+                continue
+        match = LEGACY_PBK_REGEX.search(link)
+        if match:
+            fp = f"{match.group('uuid')}:{match.group('pbk')}"
+        else:
+            match = LEGACY_HOST_REGEX.search(link)
+            fp = f"{match.group('uuid')}:{match.group('host')}" if match else None
+        out.append((fp, "white" in hits))
+    return out
+
+
+def structured(links):
+    out = []
+    for link in links:
+        node = parse_vless(link)
+        if node is None or (node.security != "reality" and node.type != "grpc"):
+            continue
+        hits = scout.SNI_MATCHER.scan(node.match_text())
+        if "black" in hits:
+            continue
+        if scout.PLACEHOLDER_MATCHER.scan(f"{node.uuid} {node.host} {node.sni}"):
+            continue
+        if not node.valid_uuid():
+            continue
+        out.append((node.fingerprint(), "white" in hits))
+    return out
+
+
+def parse_only(links):
+    return [parse_vless(link) for link in links]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--links", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    links = make_links(args.links)
+    print(f"{len(links):,} links, ~{sum(map(len, links)) // len(links)} chars each")
+
+    for name, fn in (("legacy filters", legacy), ("parse_vless only", parse_only), ("structured filters", structured)):
+        started = time.perf_counter()
+        result = fn(links)
+        elapsed = time.perf_counter() - started
+        print(f"{name:20s} {len(links) / elapsed:12,.0f} links/s  ({elapsed:.2f}s, {len(result):,} kept)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Локальная заглушка HuggingFace Inference API для прогонов без сети.
+
+Отвечает в формате text-generation: на строку — [{"generated_text": ...}],
+на список inputs — [[{...}], ...]. Вердикт выбирается по ключевым словам
+сниппета, задержка имитирует модель.
+
+    python benchmarks/hf_stub.py [--port 8766] [--delay 0.3]
+    HF_API_URL=http://127.0.0.1:8766/ HF_TOKEN=stub python scout.py
+"""
+import asyncio
+import argparse
+
+from aiohttp import web
+
+
+def fake_verdict(prompt):
+    snippet = prompt.rsplit("Snippet:", 1)[-1].lower()
+    if "how to" in snippet or "инструкция" in snippet:
+        return "Verdict: Guide Reason: tutorial text"
+    if "casino" in snippet or "promo" in snippet:
+        return "Verdict: Spam Reason: ads"
+    if "yandex" in snippet or "vk.com" in snippet or "россия" in snippet:
+        return "Verdict: RU Reason: russian sni"
+    return "Verdict: Global Reason: no local markers"
+
+
+def make_app(delay):
+    stats = {"requests": 0, "inputs": 0}
+
+    async def generate(request):
+        body = await request.json()
+        await asyncio.sleep(delay)
+        inputs = body.get("inputs")
+        stats["requests"] += 1
+        if isinstance(inputs, list):
+            stats["inputs"] += len(inputs)
+            return web.json_response([[{"generated_text": fake_verdict(p)}] for p in inputs])
+        stats["inputs"] += 1
+        return web.json_response([{"generated_text": fake_verdict(inputs or "")}])
+
+    async def report(request):
+        return web.json_response(stats)
+
+    app = web.Application()
+    app.router.add_post("/", generate)
+    app.router.add_get("/stats", report)
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--delay", type=float, default=0.3)
+    args = parser.parse_args()
+    web.run_app(make_app(args.delay), host="127.0.0.1", port=args.port)
@@ -0,0 +1,125 @@
+"""
+Локальный стенд вместо GitHub / гистов / S3 для бенчмарков scout и cleaner.
+
+Синтетический корпус детерминирован (--seed), все пути отдаёт один aiohttp-сервер:
+  /plain/{i}.txt        обычная подписка (vless reality)
+  /b64/{i}.txt          та же подписка в base64
+  /agg/{i}.txt          агрегатор: только ссылки на /plain и /b64
+  /html/{i}.txt         HTML-404 с кодом 200
+  /guide/{i}.txt        инструкция с парой ссылок-примеров
+  /slow/{i}.txt         подписка с задержкой SLOW_DELAY
+  /hang/{i}.txt         не отвечает HANG_DELAY секунд (таймауты клиента)
+  /s3/bucket{b}/{n}.txt числовые «S3»-деревья: есть файлы 1..S3_FILES, дальше 404
+
+    python benchmarks/mock_server.py [--port 8780] [--seed 0]
+"""
+import base64
+import random
+import asyncio
+import argparse
+
+from aiohttp import web
+
+SLOW_DELAY = 2.0
+HANG_DELAY = 60.0
+NODES_PER_FILE = 40
+S3_BUCKETS = 5
+S3_FILES = 6
+
+# Сколько документов каждого вида в корпусе
+CORPUS_MIX = {
+    "plain": 300,
+    "b64": 100,
+    "agg": 40,
+    "html": 60,
+    "guide": 40,
+    "slow": 10,
+    "hang": 3,
+}
+
+SNIS = ["www.yandex.ru", "vk.com", "gosuslugi.ru", "www.microsoft.com", "dl.google.com", "ozon.ru"]
+
+
+def vless_link(rng, tag):
+    uuid = "%08x-%04x-%04x-%04x-%012x" % tuple(rng.getrandbits(b) for b in (32, 16, 16, 16, 48))
+    host = ".".join(str(rng.randint(1, 254)) for _ in range(4))
+    return (
+        f"vless://{uuid}@{host}:443?encryption=none&security=reality&type=tcp"
+        f"&sni={rng.choice(SNIS)}&fp=chrome&pbk={rng.getrandbits(128):032x}&sid=ab#{tag}"
+    )
+
+
+def subscription(seed, i):
+    rng = random.Random(f"{seed}-sub-{i}")
+    return "\n".join(vless_link(rng, f"node-{i}-{n}") for n in range(NODES_PER_FILE))
+
+
+class Corpus:
+    def __init__(self, seed=0, base_url="http://127.0.0.1:8780"):
+        self.seed = seed
+        self.base_url = base_url
+
+    def urls(self, kinds=None):
+        """URL корпуса: все виды документов плюс первый файл каждого S3-дерева."""
+        kinds = kinds or list(CORPUS_MIX)
+        urls = [f"{self.base_url}/{kind}/{i}.txt" for kind in kinds for i in range(CORPUS_MIX[kind])]
+        urls += [f"{self.base_url}/s3/bucket{b}/1.txt" for b in range(S3_BUCKETS)]
+        random.Random(self.seed).shuffle(urls)
+        return urls
+
+    def document(self, kind, i):
+        if kind == "plain" or kind == "slow":
+            return subscription(self.seed, f"{kind}{i}")
+        if kind == "b64":
+            return base64.b64encode(subscription(self.seed, f"b64{i}").encode()).decode()
+        if kind == "agg":
+            rng = random.Random(f"{self.seed}-agg-{i}")
+            links = []
+            for _ in range(8):
+                target = rng.choice(["plain", "b64"])
+                links.append(f"{self.base_url}/{target}/{rng.randrange(CORPUS_MIX[target])}.txt")
+            return "\n".join(links)
+        if kind == "html":
+            return "<!DOCTYPE html><html><head><title>404</title></head><body>Not Found</body></html>"
+        if kind == "guide":
+            rng = random.Random(f"{self.seed}-guide-{i}")
+            return (
+                "# Tutorial: how to install xray\nStep 1: download the client\nStep 2: import config\n"
+                + "\n".join(vless_link(rng, "example") for _ in range(2))
+            )
+        return None
+
+
+def make_app(corpus):
+    async def document(request):
+        kind = request.match_info["kind"]
+        i = int(request.match_info["i"])
+        if kind not in CORPUS_MIX or i >= CORPUS_MIX[kind]:
+            raise web.HTTPNotFound()
+        if kind == "slow":
+            await asyncio.sleep(SLOW_DELAY)
+        if kind == "hang":
+            await asyncio.sleep(HANG_DELAY)
+        content_type = "text/html" if kind == "html" else "text/plain"
+        return web.Response(text=corpus.document(kind, i), content_type=content_type)
+
+    async def s3_file(request):
+        bucket = int(request.match_info["bucket"])
+        n = int(request.match_info["n"])
+        if bucket >= S3_BUCKETS or not 1 <= n <= S3_FILES:
+            raise web.HTTPNotFound()
+        return web.Response(text=subscription(corpus.seed, f"s3-{bucket}-{n}"))
+
+    app = web.Application()
+    app.router.add_get(r"/s3/bucket{bucket:\d+}/{n:\d+}.txt", s3_file)
+    app.router.add_get(r"/{kind}/{i:\d+}.txt", document)
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8780)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    corpus = Corpus(args.seed, f"http://127.0.0.1:{args.port}")
+    web.run_app(make_app(corpus), host="127.0.0.1", port=args.port, access_log=None, print=None)
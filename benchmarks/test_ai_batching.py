@@ -0,0 +1,139 @@
+"""
+Проверка микро-пачек HFClassifier против локальной заглушки (hf_stub.py).
+
+Заглушка поднимается в этом же процессе на свободном порту. Проверяется:
+кеш вердиктов в crawl_state, общий ответ одинаковым сниппетам в полёте,
+разбиение на пачки по AI_BATCH_SIZE (список inputs) и раздача ошибки
+всем ждущим фьючерсам пачки.
+
+    python benchmarks/test_ai_batching.py      # или python -m pytest benchmarks
+"""
+import os
+import sys
+import asyncio
+import tempfile
+
+import aiohttp
+from aiohttp import web
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from ai_classifier import AI_BATCH_SIZE, HFClassifier
+from crawl_state import CrawlState
+from hf_stub import make_app
+
+STUB_DELAY = 0.05
+
+
+class Stub:
+    """hf_stub на 127.0.0.1:<свободный порт>; stats() — счётчики заглушки."""
+
+    async def __aenter__(self):
+        self.runner = web.AppRunner(make_app(STUB_DELAY))
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://127.0.0.1:{port}/"
+        self.session = aiohttp.ClientSession()
+        return self
+
+    async def stats(self):
+        async with self.session.get(self.url + "stats") as resp:
+            return await resp.json()
+
+    async def __aexit__(self, *exc):
+        await self.session.close()
+        await self.runner.cleanup()
+
+
+def snippets(n, text="vless://node{} sni=example{}.org"):
+    return [text.format(i, i) for i in range(n)]
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_batch_size_splitting():
+    async def check():
+        async with Stub() as stub:
+            ai = HFClassifier(stub.session, stub.url, "stub")
+            count = AI_BATCH_SIZE * 2 + 3
+            verdicts = await asyncio.gather(*(ai.classify(s) for s in snippets(count)))
+            stats = await stub.stats()
+        assert all(v[0] == "global" for v in verdicts), verdicts
+        assert stats == {"requests": 3, "inputs": count}, stats
+        assert ai.batches == 3 and ai.misses == count and ai.errors == 0
+
+    run(check())
+
+
+def test_inflight_dedup():
+    async def check():
+        async with Stub() as stub:
+            ai = HFClassifier(stub.session, stub.url, "stub")
+            # Отличаются только регистром, пробелами и uuid — один ключ
+            same = [
+                "vless://11111111-2222-3333-4444-555555555555@h sni=yandex.ru",
+                "VLESS://aaaaaaaa-bbbb-cccc-dddd-eeeeeeeeeeee@h   sni=yandex.ru",
+            ] * 3
+            verdicts = await asyncio.gather(*(ai.classify(s) for s in same))
+            stats = await stub.stats()
+        assert {v[0] for v in verdicts} == {"ru"}, verdicts
+        assert stats["inputs"] == 1, stats
+        assert ai.misses == 1 and ai.hits == len(same) - 1
+
+    run(check())
+
+
+def test_cache_hits():
+    async def check():
+        with tempfile.TemporaryDirectory() as tmp:
+            state = CrawlState(os.path.join(tmp, "state.db"))
+            async with Stub() as stub:
+                first = HFClassifier(stub.session, stub.url, "stub", state=state)
+                await asyncio.gather(*(first.classify(s) for s in snippets(5)))
+                # Новый экземпляр (следующий запуск) — только из кеша
+                second = HFClassifier(stub.session, stub.url, "stub", state=state)
+                verdicts = await asyncio.gather(*(second.classify(s) for s in snippets(5)))
+                stats = await stub.stats()
+            state.close()
+        assert all(v[0] == "global" for v in verdicts), verdicts
+        assert stats["inputs"] == 5, stats
+        assert second.hits == 5 and second.misses == 0 and second.batches == 0
+
+    run(check())
+
+
+def test_error_fans_out():
+    async def check():
+        with tempfile.TemporaryDirectory() as tmp:
+            state = CrawlState(os.path.join(tmp, "state.db"))
+            async with Stub() as stub:
+                # Несуществующий путь заглушки: 404 на каждую пачку
+                ai = HFClassifier(stub.session, stub.url + "missing", "stub", state=state)
+                count = AI_BATCH_SIZE + 2
+                texts = snippets(count) + snippets(2)   # и ждущие того же сниппета
+                verdicts = await asyncio.wait_for(
+                    asyncio.gather(*(ai.classify(s) for s in texts)), timeout=10
+                )
+                # Ошибка не кешируется: повтор снова идёт в сеть
+                retry = HFClassifier(stub.session, stub.url, "stub", state=state)
+                again = await retry.classify(texts[0])
+            state.close()
+        assert verdicts == [("unknown", "Error")] * len(texts), verdicts
+        assert ai.batches == 2 and ai.errors == 2
+        assert not ai._inflight
+        assert again[0] == "global" and retry.misses == 1
+
+    run(check())
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"ok  {name}")
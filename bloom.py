@@ -0,0 +1,194 @@
+import math
+import array
+import heapq
+import bisect
+import hashlib
+import logging
+
+logger = logging.getLogger("Bloom")
+
+# --- BLOOM DEDUP SETS ---
+# VISITED_URLS / CONTENT_HASHES / SEEN_FINGERPRINTS были обычными set'ами
+# строк: ~100+ байт на URL или отпечаток. BloomSet хранит ~2.6 байта на
+# элемент при 1e-4 ложных срабатываний и растёт слоями (scalable Bloom):
+# когда слой заполнен, добавляется вдвое больший с вдвое меньшим fp_rate,
+# так что суммарная вероятность ошибки остаётся ограниченной.
+# Ложное срабатывание — «уже видели», т.е. пропуск URL/документа. Для
+# отпечатков нод это потерянная нода, поэтому BloomSet(exact=True)
+# подтверждает положительный ответ точным DigestSet (8 байт на элемент);
+# отрицательный ответ фильтра (новая нода) до него не доходит, а такой
+# дайджест добавляется без поиска.
+# Множества живут один запуск: между запусками помнит crawl_state, а шарды
+# работают одновременно и делить файл не могут — на диск они не пишутся.
+
+DEFAULT_FP_RATE = 1e-4
+DEFAULT_CAPACITY = 1_000_000
+LN2 = math.log(2)
+
+# Новые дайджесты (всё — array('Q'), 8 байт на элемент): отсортированный
+# буфер до DIGEST_BUFFER (bisect.insort) -> средний отсортированный массив
+# до 1/8 основного (но не меньше DIGEST_MERGE_MIN) -> основной массив.
+# Слияния потоковые, амортизированно O(1/DIGEST_BUFFER + 8/n) проходов на элемент
+DIGEST_BUFFER = 4096
+DIGEST_MERGE_MIN = 65536
+
+
+def hash_key(key):
+    """Два 64-битных хеша ключа: h1 — он же точный дайджест, h2 — шаг двойного хеширования."""
+    value = int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest(), "little")
+    return value & 0xFFFFFFFFFFFFFFFF, (value >> 64) | 1
+
+
+class BloomFilter:
+    def __init__(self, capacity=DEFAULT_CAPACITY, fp_rate=DEFAULT_FP_RATE):
+        self.capacity = capacity
+        self.fp_rate = fp_rate
+        m = math.ceil(-capacity * math.log(fp_rate) / (LN2 * LN2))
+        self.m = max(64, (m + 7) // 8 * 8)
+        self.k = max(1, round(self.m / capacity * LN2))
+        self.count = 0
+        self.bits = bytearray(self.m // 8)
+
+    # Позиции двойного хеширования h1 + i*h2 (mod m) считаются приращением,
+    # без умножения длинных чисел на каждом шаге
+    def add_hashed(self, h1, h2):
+        """Ставит биты ключа. True, если ключ новый (хоть один бит был снят) — он идёт в count."""
+        bits, m = self.bits, self.m
+        pos, step = h1 % m, h2 % m
+        new = False
+        for _ in range(self.k):
+            byte, mask = pos >> 3, 1 << (pos & 7)
+            if not bits[byte] & mask:
+                bits[byte] |= mask
+                new = True
+            pos += step
+            if pos >= m:
+                pos -= m
+        if new:
+            self.count += 1
+        return new
+
+    def contains_hashed(self, h1, h2):
+        bits, m = self.bits, self.m
+        pos, step = h1 % m, h2 % m
+        for _ in range(self.k):
+            if not bits[pos >> 3] >> (pos & 7) & 1:
+                return False
+            pos += step
+            if pos >= m:
+                pos -= m
+        return True
+
+    def add(self, key):
+        self.add_hashed(*hash_key(key))
+
+    def __contains__(self, key):
+        return self.contains_hashed(*hash_key(key))
+
+    @property
+    def full(self):
+        return self.count >= self.capacity
+
+    @property
+    def nbytes(self):
+        return self.m // 8
+
+
+class DigestSet:
+    """Точное множество 64-битных дайджестов: три отсортированных array('Q') разного размера."""
+
+    def __init__(self):
+        self.sorted = array.array("Q")
+        self.recent = array.array("Q")
+        self.pending = array.array("Q")
+
+    @staticmethod
+    def _has(run, digest):
+        i = bisect.bisect_left(run, digest)
+        return i < len(run) and run[i] == digest
+
+    def __contains__(self, digest):
+        return self._has(self.sorted, digest) or self._has(self.recent, digest) or self._has(self.pending, digest)
+
+    def add(self, digest):
+        if digest not in self:
+            self.add_new(digest)
+
+    def add_new(self, digest):
+        """Дайджест, которого точно нет (фильтр Блума его не видел), — без поиска."""
+        bisect.insort(self.pending, digest)
+        if len(self.pending) < DIGEST_BUFFER:
+            return
+        self.recent = array.array("Q", heapq.merge(self.recent, self.pending))
+        self.pending = array.array("Q")
+        if len(self.recent) >= max(DIGEST_MERGE_MIN, len(self.sorted) // 8):
+            self.merge()
+
+    def merge(self):
+        self.sorted = array.array("Q", heapq.merge(self.sorted, self.recent, self.pending))
+        self.recent = array.array("Q")
+        self.pending = array.array("Q")
+
+    def __len__(self):
+        return len(self.sorted) + len(self.recent) + len(self.pending)
+
+
+class BloomSet:
+    """
+    Множество с интерфейсом set (add / in / len) поверх слоёв BloomFilter.
+    exact=True — положительные ответы подтверждаются DigestSet (без ложных «уже видели»
+    с точностью до коллизии 64-битных дайджестов, ~n²/2⁶⁵).
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, fp_rate=DEFAULT_FP_RATE, exact=False):
+        self.capacity = capacity
+        self.fp_rate = fp_rate
+        self.layers = [BloomFilter(capacity, fp_rate / 2)]
+        self.exact = DigestSet() if exact else None
+
+    def _bloom_contains(self, h1, h2):
+        for layer in self.layers:
+            if layer.contains_hashed(h1, h2):
+                return True
+        return False
+
+    def __contains__(self, key):
+        h1, h2 = hash_key(key)
+        if not self._bloom_contains(h1, h2):
+            return False
+        return self.exact is None or h1 in self.exact
+
+    def add(self, key):
+        h1, h2 = hash_key(key)
+        # Проверка и установка битов последнего слоя — за один проход
+        for layer in self.layers[:-1]:
+            if layer.contains_hashed(h1, h2):
+                if self.exact is not None:
+                    self.exact.add(h1)
+                return
+        layer = self.layers[-1]
+        if layer.full and not layer.contains_hashed(h1, h2):
+            # Следующий слой вдвое больше и вдвое строже: сумма fp_rate/2 + fp_rate/4 + ... < fp_rate
+            layer = BloomFilter(layer.capacity * 2, layer.fp_rate / 2)
+            self.layers.append(layer)
+            logger.debug(f"Bloom layer {len(self.layers)}: capacity {layer.capacity}")
+        new = layer.add_hashed(h1, h2)
+        if self.exact is not None:
+            # Снятый бит — ключа точно не было ни в одном слое
+            if new:
+                self.exact.add_new(h1)
+            else:
+                self.exact.add(h1)
+
+    def __len__(self):
+        """Число различных элементов (для exact — точное, иначе оценка снизу по фильтру)."""
+        if self.exact is not None:
+            return len(self.exact)
+        return sum(layer.count for layer in self.layers)
+
+    @property
+    def nbytes(self):
+        size = sum(layer.nbytes for layer in self.layers)
+        if self.exact is not None:
+            size += len(self.exact) * 8
+        return size
@@ -0,0 +1,211 @@
+import re
+import json
+import math
+import zlib
+
+from ai_classifier import normalize_snippet
+
+# --- LOCAL TEXT CLASSIFIER ---
+# Быстрая замена удалённому Mistral для вердикта RU / Global / Guide / Spam.
+# Мультиномиальный наивный Байес на хешированных признаках: слова, биграммы
+# слов и доменные имена целиком (gosuslugi.ru, vk.com) -> crc32 -> бакет.
+# Признак считается один раз на документ (binary NB): иначе двадцать
+# одинаковых vless-строк перевешивают заголовок "Инструкция: ...".
+# Без словаря и без numpy: модель — разреженные счётчики по бакетам в JSON.
+# Обучается train_classifier.py на источниках из verified_ru.txt /
+# potential_mixed.txt; удалённая модель нужна только при низкой уверенности.
+# Апостериорная вероятность NB почти всегда ~1.0 (признаки не независимы),
+# поэтому она калибруется: температура подбирается по out-of-fold оценкам
+# кросс-валидации (минимум log loss), а порог уверенности — по кривой
+# «уверенность — точность» на тех же оценках: самый низкий порог, при
+# котором точность уверенных ответов не ниже TARGET_ACCURACY.
+
+MODEL_FILE = "text_model.json"
+NUM_BUCKETS = 1 << 18
+ALPHA = 0.5                    # сглаживание Лапласа
+CONFIDENT = 0.9                # порог некалиброванной модели; ниже — спрашиваем удалённую
+TARGET_ACCURACY = 0.95         # точность, с которой локальный ответ заменяет удалённый
+CALIBRATION_FOLDS = 5
+MIN_CONFIDENT = 20             # меньше уверенных ответов на отложенных данных — порогу не верим
+NEVER_CONFIDENT = 1.01         # недостижимый порог: всё уходит в удалённую модель
+# Сетка температур 1..1000 (разности логарифмов NB — десятки и сотни)
+TEMPERATURES = [10 ** (i / 20) for i in range(61)]
+
+_WORD_REGEX = re.compile(r'\w+')
+_DOMAIN_REGEX = re.compile(r'\b(?:[a-z0-9-]+\.)+[a-z]{2,}\b')
+
+
+def features(snippet, num_buckets=NUM_BUCKETS):
+    """Множество бакетов признаков нормализованного сниппета."""
+    text = normalize_snippet(snippet)
+    words = [w for w in _WORD_REGEX.findall(text) if len(w) > 1]
+    grams = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    grams += ["d:" + d for d in _DOMAIN_REGEX.findall(text)]
+    mask = num_buckets - 1
+    return {zlib.crc32(gram.encode("utf-8")) & mask for gram in grams}
+
+
+class NaiveBayes:
+    def __init__(self, num_buckets=NUM_BUCKETS, alpha=ALPHA):
+        self.num_buckets = num_buckets
+        self.alpha = alpha
+        self.docs = {}        # label -> документов
+        self.totals = {}      # label -> сумма счётчиков
+        self.counts = {}      # label -> {бакет: счётчик}
+        self.temperature = 1.0
+        self.threshold = CONFIDENT
+        self._log_prior = {}
+        self._log_lik = {}
+        self._log_unseen = {}
+
+    # --- обучение ---
+
+    def fit(self, snippets, labels):
+        for snippet, label in zip(snippets, labels):
+            self.docs[label] = self.docs.get(label, 0) + 1
+            bucket_counts = self.counts.setdefault(label, {})
+            feats = features(snippet, self.num_buckets)
+            for bucket in feats:
+                bucket_counts[bucket] = bucket_counts.get(bucket, 0) + 1
+            self.totals[label] = self.totals.get(label, 0) + len(feats)
+        self._prepare()
+        return self
+
+    def _prepare(self):
+        total_docs = sum(self.docs.values())
+        for label, n_docs in self.docs.items():
+            denom = self.totals.get(label, 0) + self.alpha * self.num_buckets
+            self._log_prior[label] = math.log(n_docs / total_docs)
+            self._log_unseen[label] = math.log(self.alpha / denom)
+            self._log_lik[label] = {
+                bucket: math.log((n + self.alpha) / denom)
+                for bucket, n in self.counts[label].items()
+            }
+
+    # --- предсказание ---
+
+    def scores(self, snippet):
+        """{label: логарифм апостериорной вероятности без нормировки}."""
+        feats = features(snippet, self.num_buckets)
+        scores = {}
+        for label, log_lik in self._log_lik.items():
+            unseen = self._log_unseen[label]
+            score = self._log_prior[label]
+            for bucket in feats:
+                score += log_lik.get(bucket, unseen)
+            scores[label] = score
+        return scores
+
+    def predict(self, snippet):
+        """(label, калиброванная уверенность 0..1)."""
+        return _top(self.scores(snippet), self.temperature)
+
+    def predict_batch(self, snippets):
+        return [self.predict(s) for s in snippets]
+
+    def confident(self, confidence):
+        return confidence >= self.threshold
+
+    # --- калибровка ---
+
+    def calibrate(self, held_scores, labels):
+        """Температура и порог по оценкам scores() на данных, которых модель не видела."""
+        def log_loss(temperature):
+            loss = 0.0
+            for scores, label in zip(held_scores, labels):
+                if label not in scores:
+                    loss += 30.0
+                    continue
+                top = max(scores.values())
+                norm = sum(math.exp((s - top) / temperature) for s in scores.values())
+                loss -= (scores[label] - top) / temperature - math.log(norm)
+            return loss
+
+        self.temperature = min(TEMPERATURES, key=log_loss)
+        curve = confidence_curve(held_scores, labels, self.temperature)
+        self.threshold = NEVER_CONFIDENT
+        for confidence, covered, accuracy in curve:
+            if covered >= MIN_CONFIDENT and accuracy >= TARGET_ACCURACY:
+                self.threshold = confidence
+        return curve
+
+    # --- сериализация ---
+
+    def save(self, path=MODEL_FILE):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({
+                "num_buckets": self.num_buckets,
+                "alpha": self.alpha,
+                "temperature": self.temperature,
+                "threshold": self.threshold,
+                "docs": self.docs,
+                "totals": self.totals,
+                "counts": {label: {str(b): n for b, n in c.items()} for label, c in self.counts.items()},
+            }, f, separators=(",", ":"))
+
+    @classmethod
+    def load(cls, path=MODEL_FILE):
+        with open(path, "r", encoding="utf-8") as f:
+            raw = json.load(f)
+        model = cls(raw["num_buckets"], raw["alpha"])
+        model.docs = raw["docs"]
+        model.totals = raw["totals"]
+        model.counts = {label: {int(b): n for b, n in c.items()} for label, c in raw["counts"].items()}
+        # Модели до калибровки: сырая уверенность и старый порог
+        model.temperature = raw.get("temperature", 1.0)
+        model.threshold = raw.get("threshold", CONFIDENT)
+        model._prepare()
+        return model
+
+
+def _top(scores, temperature):
+    if not scores:
+        return "unknown", 0.0
+    best = max(scores, key=scores.get)
+    top = scores[best]
+    norm = sum(math.exp((s - top) / temperature) for s in scores.values())
+    return best, 1.0 / norm
+
+
+def confidence_curve(held_scores, labels, temperature):
+    """
+    Кривая «уверенность — точность»: [(порог, сколько ответов не ниже порога,
+    их точность)] по убыванию порога, по одной точке на различное значение.
+    """
+    ranked = sorted(
+        ((*_top(scores, temperature), label) for scores, label in zip(held_scores, labels)),
+        key=lambda x: -x[1],
+    )
+    curve = []
+    correct = 0
+    for i, (predicted, confidence, label) in enumerate(ranked):
+        correct += predicted == label
+        if i + 1 == len(ranked) or ranked[i + 1][1] < confidence:
+            curve.append((confidence, i + 1, correct / (i + 1)))
+    return curve
+
+
+def fit_calibrated(snippets, labels, folds=CALIBRATION_FOLDS):
+    """
+    Модель на всех данных; температура и порог — по out-of-fold оценкам:
+    каждый пример оценивает модель, обученная без его фолда.
+    Возвращает (модель, кривая уверенность — точность).
+    """
+    held_scores, held_labels = [], []
+    for k in range(folds):
+        train = [i for i in range(len(snippets)) if i % folds != k]
+        model = NaiveBayes().fit([snippets[i] for i in train], [labels[i] for i in train])
+        for i in range(k, len(snippets), folds):
+            held_scores.append(model.scores(snippets[i]))
+            held_labels.append(labels[i])
+    model = NaiveBayes().fit(snippets, labels)
+    curve = model.calibrate(held_scores, held_labels)
+    return model, curve
+
+
+def load_model(path=MODEL_FILE):
+    """Модель с диска или None, если её ещё не обучали."""
+    try:
+        return NaiveBayes.load(path)
+    except (OSError, ValueError, KeyError):
+        return None
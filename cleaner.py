@@ -1,9 +1,18 @@
 import os
+import json
+import time
 import asyncio
-import aiohttp
 import re
+import hashlib
 import logging
-import random
+import argparse
+
+from crawl_state import CrawlState
+from matcher import KeywordMatcher
+from http_client import BodyRejected, HostStats, create_session, read_text_capped
+from vless import parse_vless, normalize_fingerprint
+from dedup import minhash_signature, cluster_duplicates
+from list_writer import atomic_write_lines
 
 # --- CONFIGURATION ---
 logging.basicConfig(
@@ -15,11 +24,30 @@ logger = logging.getLogger("Cleaner")
 
 INPUT_FILE = "verified_ru.txt"
 BACKUP_FILE = "verified_ru_backup.txt"
+# ETag / Last-Modified и прошлые вердикты (для conditional GET)
+STATE_FILE = "cleaner_state.db"
+
+# Скользящее окно: столько запросов всегда в полёте
+CONCURRENCY = 50
+# Не больше стольких одновременных соединений к одному хосту (лимит коннектора)
+PER_HOST_LIMIT = 25
+
+# История живости (таблица health в STATE_FILE): удаляем только после
+# REMOVE_AFTER_FAILURES провалов подряд, растянутых минимум на REMOVE_MIN_SPAN.
+# Здоровые стабильные источники перепроверяем всё реже, сбоящие — чаще.
+REMOVE_AFTER_FAILURES = 3
+REMOVE_MIN_SPAN = 3 * 86400
+HEALTHY_RECHECK_BASE = 86400          # x2 за каждую успешную проверку подряд
+HEALTHY_RECHECK_MAX = 14 * 86400
+FAILING_RECHECK_BASE = 6 * 3600       # x2 за каждый провал подряд
+FAILING_RECHECK_MAX = 2 * 86400
+LATENCY_DECAY = 0.3                   # EWMA задержки ответа
+
+# Прогресс прогона: какие индексы проверены и с каким вердиктом
+CHECKPOINT_FILE = "verified_ru.checkpoint.json"
+CHECKPOINT_EVERY = 200       # результатов между сбросами на диск
+CHECKPOINT_INTERVAL = 30     # ...или секунд
 
-USER_AGENTS = [
-    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36",
-    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.3 Safari/605.1.15",
-]
 
 # --- PRE-FILTERS (Чтобы не качать мусор) ---
 # Расширения, которые мы игнорируем сразу
@@ -27,8 +55,18 @@ SKIP_EXTENSIONS = {'.sh', '.md', '.py', '.jpg', '.png', '.gif', '.svg', '.zip',
 # Слова в имени файла, которые нам не нужны
 SKIP_KEYWORDS = {'readme', 'install', 'tutorial', 'instruction', 'changelog', 'license'}
 
-def get_random_header():
-    return {"User-Agent": random.choice(USER_AGENTS)}
+# --- CONTENT FILTERS ---
+BAD_DOMAINS = ['.ir', 'zula.ir']
+BLACK_SNI = ['google.com', 'youtube.com', 'pornhub', 'bet', 'casino']
+PLACEHOLDER_STRINGS = ['uuid', 'server', 'example.com', '1.1.1.1']
+
+VLESS_LINK_REGEX = re.compile(r'vless://[^\s<>"]+')
+
+# По всему документу — один проход вместо any() по списку доменов
+DOC_MATCHER = KeywordMatcher({"bad_domain": BAD_DOMAINS})
+# По полям разобранной ссылки (VlessNode), один проход на все списки
+SNI_MATCHER = KeywordMatcher({"black": BLACK_SNI})
+PLACEHOLDER_MATCHER = KeywordMatcher({"placeholder": PLACEHOLDER_STRINGS})
 
 def should_skip_url(url):
     """Проверяет URL перед скачиванием."""
@@ -47,70 +85,312 @@ def should_skip_url(url):
             
     return False, ""
 
-def get_md5_head(content):
-    import hashlib
-    head = content[:500].encode('utf-8', errors='ignore')
-    return hashlib.md5(head).hexdigest()
-
 def is_valid_content(content):
-    """Строгая проверка содержимого."""
+    """Строгая проверка содержимого. Возвращает (ok, reason, отпечатки валидных нод)."""
     # 1. Проверка на HTML (404 страницы)
     if "<!DOCTYPE html" in content or "<html>" in content.lower():
-        return False, "HTML Page (likely 404)"
+        return False, "HTML Page (likely 404)", []
         
     # 2. Проверка на мусорные домены
-    BAD_DOMAINS = ['.ir', 'zula.ir']
-    if any(d in content for d in BAD_DOMAINS): 
-        return False, "Bad Domain found"
+    if DOC_MATCHER.scan(content):
+        return False, "Bad Domain found", []
         
     # 3. Поиск VLESS ссылок
-    vless_links = re.findall(r'vless://[^\s<>"]+', content)
+    vless_links = VLESS_LINK_REGEX.findall(content)
     if not vless_links:
-        return False, "No VLESS links found"
+        return False, "No VLESS links found", []
     
     valid_count = 0
-    BLACK_SNI = ['google.com', 'youtube.com', 'pornhub', 'bet', 'casino']
+    fingerprints = []
     
     for link in vless_links:
-        if "security=reality" not in link and "type=grpc" not in link: continue
-        if any(b in link for b in BLACK_SNI): continue
+        node = parse_vless(link)
+        if node is None: continue
+        if node.security != "reality" and node.type != "grpc": continue
+        if SNI_MATCHER.scan(node.match_text()): continue
         
         # Простая проверка на заглушки
-        if any(ph in link for ph in ['uuid', 'server', 'example.com', '1.1.1.1']): continue
+        if PLACEHOLDER_MATCHER.scan(f"{node.uuid} {node.host} {node.sni}"): continue
         
         valid_count += 1
+        fingerprints.append(normalize_fingerprint(node.fingerprint()))
 
     if valid_count == 0:
-        return False, "No valid Reality configs"
+        return False, "No valid Reality configs", []
     
-    return True, f"Found {valid_count} nodes"
+    return True, f"Found {valid_count} nodes", fingerprints
 
 # --- CLEANER CORE ---
 
-async def check_url(session, url):
+async def check_url(session, url, state=None):
+    """
+    Возвращает (is_alive, reason, info). Для живых info = (node_count, signature),
+    где signature — MinHash-подпись множества нод (для поиска зеркал).
+    """
     # Предварительная фильтрация
     skip, reason = should_skip_url(url)
     if skip:
-        return False, reason
+        return False, reason, None
+
+    headers = {}
+    cached = None
+    if state is not None:
+        validators, cached = state.conditional_headers(url)
+        headers.update(validators)
 
     try:
-        async with session.get(url, headers=get_random_header(), timeout=8) as resp:
+        async with session.get(url, headers=headers, timeout=8) as resp:
+            if resp.status == 304 and cached is not None:
+                # Файл не менялся с прошлой проверки — тело не качаем
+                state.touch(url)
+                if cached["verdict"] == "alive":
+                    info = (cached["node_count"], cached["signature"])
+                    return True, f"Not modified ({cached['node_count']} nodes)", info
+                return False, "Not modified (still invalid)", None
+
             if resp.status != 200:
-                return False, f"HTTP {resp.status}"
+                return False, f"HTTP {resp.status}", None
             
-            content = await resp.text(errors='ignore')
+            content = await read_text_capped(resp)
             
             if len(content) < 50:
-                return False, "Too small content"
+                return False, "Too small content", None
                 
-            return is_valid_content(content)
+            is_alive, reason, fingerprints = is_valid_content(content)
+            node_count = len(set(fingerprints))
+            signature = minhash_signature(fingerprints)
+            if state is not None:
+                state.record(
+                    url, "alive" if is_alive else "dead", node_count,
+                    etag=resp.headers.get("ETag"),
+                    last_modified=resp.headers.get("Last-Modified"),
+                    signature=signature
+                )
+            return is_alive, reason, (node_count, signature) if is_alive else None
             
+    except BodyRejected as e:
+        return False, e.reason, None
     except asyncio.TimeoutError:
-        return False, "Timeout"
+        return False, "Timeout", None
     except Exception as e:
-        return False, str(e)
+        return False, str(e), None
+
+# --- HEALTH ---
+
+def is_due(state, url, now=None):
+    health = state.get_health(url)
+    return health is None or health["next_check"] <= (now or int(time.time()))
+
+def cached_result(state, url):
+    """Результат для URL, которому ещё рано на перепроверку: прошлые ноды и подпись."""
+    entry = state.get(url)
+    health = state.get_health(url)
+    if health["consecutive_failures"]:
+        return True, f"Not due, failing x{health['consecutive_failures']}", None
+    info = (entry["node_count"], entry["signature"]) if entry is not None else None
+    return True, "Not due (healthy)", info
+
+def judge(state, url, observation, latency, now=None):
+    """
+    Обновляет историю URL по результату check_url и решает судьбу:
+    (keep, reason, info). Одиночный провал URL не убивает.
+    """
+    is_alive, reason, info = observation
+    now = now or int(time.time())
+    health = state.get_health(url) or {
+        "url": url, "consecutive_failures": 0, "ok_streak": 0, "failing_since": None,
+        "last_success": None, "latency_ms": None, "next_check": 0, "last_reason": None,
+    }
+    health["last_reason"] = reason
+
+    if is_alive:
+        latency_ms = latency * 1000
+        prev = health["latency_ms"]
+        health["latency_ms"] = latency_ms if prev is None else prev + LATENCY_DECAY * (latency_ms - prev)
+        health["consecutive_failures"] = 0
+        health["failing_since"] = None
+        health["last_success"] = now
+        health["ok_streak"] += 1
+        interval = HEALTHY_RECHECK_BASE * 2 ** (health["ok_streak"] - 1)
+        health["next_check"] = now + min(interval, HEALTHY_RECHECK_MAX)
+        state.save_health(health)
+        return True, reason, info
+
+    health["ok_streak"] = 0
+    health["consecutive_failures"] += 1
+    if health["failing_since"] is None:
+        health["failing_since"] = now
+    span = now - health["failing_since"]
+    if health["consecutive_failures"] >= REMOVE_AFTER_FAILURES and span >= REMOVE_MIN_SPAN:
+        state.forget_health(url)
+        return False, f"{reason} (x{health['consecutive_failures']} over {span // 3600}h)", None
+
+    interval = FAILING_RECHECK_BASE * 2 ** (health["consecutive_failures"] - 1)
+    health["next_check"] = now + min(interval, FAILING_RECHECK_MAX)
+    state.save_health(health)
+    return True, f"{reason}, strike {health['consecutive_failures']}/{REMOVE_AFTER_FAILURES}", None
+
+async def run_checks(session, urls, state, indices=None, on_result=None):
+    """
+    Проверяет URL (все или только indices), держа CONCURRENCY запросов в полёте
+    и не больше PER_HOST_LIMIT на хост. Возвращает результаты check_url в
+    порядке urls, None — для URL, отсеянных до запроса или не входящих в indices.
+    on_result(i, result) вызывается на каждый готовый результат (чекпоинты).
+    """
+    results = [None] * len(urls)
+    queue = asyncio.Queue()
+    for i in (range(len(urls)) if indices is None else indices):
+        url = urls[i]
+        # Проверяем URL до запроса (экономия времени)
+        skip, reason = should_skip_url(url)
+        if skip:
+            logger.info(f"  ⚡ [SKIP] {url.split('/')[-1]}...")
+            if on_result is not None:
+                on_result(i, (False, reason, None))
+            continue
+        queue.put_nowait(i)
+
+    async def worker():
+        while True:
+            try:
+                i = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            url = urls[i]
+            started = time.perf_counter()
+            observation = await check_url(session, url, state)
+            keep, reason, info = judge(state, url, observation, time.perf_counter() - started)
+            results[i] = (keep, reason, info)
+            if on_result is not None:
+                on_result(i, results[i])
+            if not keep:
+                logger.info(f"  ❌ [{i+1}] KILLED: {url[:50]}... ({reason})")
+            elif not observation[0]:
+                logger.info(f"  ⚠️ [{i+1}] FAILED: {url[:50]}... ({reason})")
+
+    await asyncio.gather(*(worker() for _ in range(CONCURRENCY)))
+    return results
+
+# --- CHECKPOINTS ---
+# Прогон можно прервать и продолжить (--resume), а большой список — чистить
+# порциями по нескольку запусков (--max-urls). Рядом со списком лежит
+# CHECKPOINT_FILE: хеш списка, проверенные диапазоны индексов и вердикты по URL.
+# Список переписывается только когда проверен целиком.
+
+def list_digest(urls):
+    return hashlib.sha1("\n".join(urls).encode("utf-8")).hexdigest()
+
+
+def _to_ranges(indices):
+    ranges = []
+    for i in sorted(indices):
+        if ranges and ranges[-1][1] == i:
+            ranges[-1][1] = i + 1
+        else:
+            ranges.append([i, i + 1])
+    return ranges
+
+
+class Checkpoint:
+    def __init__(self, path, urls):
+        self.path = path
+        self.urls = urls
+        self.digest = list_digest(urls)
+        self.verdicts = {}          # url -> (is_alive, reason, info)
+        self.done = set()           # проверенные индексы
+        self.started = int(time.time())
+        self._unsaved = 0
+        self._last_flush = time.monotonic()
 
-async def main():
+    @classmethod
+    def load(cls, path, urls):
+        """Чекпоинт прошлого прогона. Если список с тех пор изменился — сверяемся по URL."""
+        checkpoint = cls(path, urls)
+        if not os.path.exists(path):
+            return checkpoint
+        with open(path, "r", encoding="utf-8") as f:
+            raw = json.load(f)
+        checkpoint.started = raw.get("started", checkpoint.started)
+        for url, (is_alive, reason, node_count, sig_hex) in raw.get("verdicts", {}).items():
+            info = (node_count, bytes.fromhex(sig_hex) if sig_hex else None) if is_alive else None
+            checkpoint.verdicts[url] = (is_alive, reason, info)
+        if raw.get("digest") == checkpoint.digest:
+            for start, end in raw.get("ranges", []):
+                checkpoint.done.update(range(start, end))
+        else:
+            checkpoint.done = {i for i, url in enumerate(urls) if url in checkpoint.verdicts}
+        return checkpoint
+
+    def add(self, i, result):
+        self.verdicts[self.urls[i]] = result
+        self.done.add(i)
+        self._unsaved += 1
+        if self._unsaved >= CHECKPOINT_EVERY or time.monotonic() - self._last_flush >= CHECKPOINT_INTERVAL:
+            self.flush()
+
+    def pending(self):
+        return [i for i in range(len(self.urls)) if i not in self.done]
+
+    def complete(self):
+        return len(self.done) >= len(self.urls)
+
+    def results(self):
+        """Результаты в порядке списка — как у run_checks."""
+        return [self.verdicts.get(url) for url in self.urls]
+
+    def flush(self):
+        verdicts = {}
+        for url, (is_alive, reason, info) in self.verdicts.items():
+            node_count, signature = info if info is not None else (0, None)
+            verdicts[url] = [is_alive, reason, node_count, signature.hex() if signature else None]
+        payload = {
+            "digest": self.digest,
+            "total": len(self.urls),
+            "started": self.started,
+            "ranges": _to_ranges(self.done),
+            "verdicts": verdicts,
+        }
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(payload, f, separators=(",", ":"))
+        os.replace(tmp_path, self.path)
+        self._unsaved = 0
+        self._last_flush = time.monotonic()
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+def drop_mirrors(urls, results):
+    """
+    Кластеризует живые источники по MinHash-подписям множеств нод и
+    оставляет по одному представителю (больше всего нод, при равенстве — первый).
+    Возвращает множество индексов-дублей.
+    """
+    signatures = {}
+    for i, result in enumerate(results):
+        if result is not None and result[0] and result[2] is not None:
+            signatures[i] = result[2][1]
+
+    duplicates = set()
+    for cluster in cluster_duplicates(signatures):
+        keep = max(cluster, key=lambda i: (results[i][2][0], -i))
+        for i in cluster:
+            if i != keep:
+                duplicates.add(i)
+                logger.info(f"  ♻️ [{i+1}] MIRROR of {urls[keep][:50]}...: {urls[i][:50]}...")
+    return duplicates
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Чистка verified_ru.txt от мёртвых источников")
+    parser.add_argument("--resume", action="store_true",
+                        help=f"продолжить с {CHECKPOINT_FILE}, а не начинать заново")
+    parser.add_argument("--max-urls", type=int, default=0,
+                        help="проверить не больше стольких URL за запуск (0 = все оставшиеся)")
+    return parser.parse_args(argv)
+
+async def main(argv=None):
+    args = parse_args(argv)
     if not os.path.exists(INPUT_FILE):
         logger.error(f"File {INPUT_FILE} not found!")
         return
@@ -118,60 +398,72 @@ async def main():
     # 1. Чтение
     with open(INPUT_FILE, "r", encoding="utf-8") as f:
         urls = [line.strip() for line in f if line.strip()]
-    
-    logger.info(f"🛁 Starting genocide for {len(urls)} URLs...")
-    
-    # Бэкап
-    with open(BACKUP_FILE, "w", encoding="utf-8") as f:
-        f.write("\n".join(urls))
-    logger.info(f"📦 Backup saved to {BACKUP_FILE}")
 
+    if args.resume and os.path.exists(CHECKPOINT_FILE):
+        checkpoint = Checkpoint.load(CHECKPOINT_FILE, urls)
+        logger.info(f"⏯️ Resuming: {len(checkpoint.done)}/{len(urls)} already checked")
+    else:
+        checkpoint = Checkpoint(CHECKPOINT_FILE, urls)
+        # Бэкап — только в начале полного прохода
+        with open(BACKUP_FILE, "w", encoding="utf-8") as f:
+            f.write("\n".join(urls))
+        logger.info(f"📦 Backup saved to {BACKUP_FILE}")
+
+    state = CrawlState(STATE_FILE)
+
+    # Кому ещё рано на перепроверку — берём прошлый результат без запроса
+    pending = []
+    not_due = 0
+    for i in checkpoint.pending():
+        if is_due(state, urls[i]):
+            pending.append(i)
+        else:
+            checkpoint.add(i, cached_result(state, urls[i]))
+            not_due += 1
+    if args.max_urls:
+        pending = pending[:args.max_urls]
+    logger.info(f"🛁 Starting genocide for {len(pending)} of {len(urls)} URLs ({not_due} not due yet)...")
+
+    host_stats = HostStats()
+    try:
+        async with create_session(
+            limit=CONCURRENCY, limit_per_host=PER_HOST_LIMIT, stats=host_stats
+        ) as session:
+            await run_checks(session, urls, state, indices=pending, on_result=checkpoint.add)
+    finally:
+        # Прерванный прогон не теряется: следующий запуск с --resume продолжит отсюда
+        checkpoint.flush()
+        state.close()
+    host_stats.log_summary()
+
+    if not checkpoint.complete():
+        logger.info(
+            f"⏸️ Checked {len(checkpoint.done)}/{len(urls)}. "
+            f"List is rewritten after the last slice (run with --resume)"
+        )
+        return
+
+    results = checkpoint.results()
+
+    # Зеркала и форки одной подписки: оставляем одного представителя
+    mirrors = drop_mirrors(urls, results)
+
+    # Порядок выживших = порядок входного файла
     survivors = []
-    seen_hashes = set()
-    
-    async with aiohttp.ClientSession() as session:
-        tasks = []
-        for i, url in enumerate(urls):
-            # Проверяем URL до запроса (экономия времени)
-            if should_skip_url(url)[0]:
-                logger.info(f"  ⚡ [SKIP] {url.split('/')[-1]}...")
-                continue
-
-            task = check_url(session, url)
-            tasks.append((i, url, task))
-            
-            # Пачки
-            if len(tasks) >= 20 or i == len(urls) - 1:
-                results = await asyncio.gather(*[t[2] for t in tasks])
-                
-                for idx, (orig_i, url, _) in enumerate(tasks):
-                    is_alive, reason = results[idx]
-                    
-                    if is_alive:
-                        # Дедупликация по хешу (чтобы не держать 5 версий одного файла)
-                        # Но для этого нужен контент, а мы его уже скачали внутри is_valid_content...
-                        # Чтобы не качать 2 раза, is_valid_content должна вернуть хеш или контент.
-                        # Упростим: просто проверяем живость. 
-                        # Если нужна дедупликация содержимого, надо переписать логику сохранения контента.
-                        
-                        # Считаем, что если alive - он уникальный по URL
-                        survivors.append(url)
-                    else:
-                        logger.info(f"  ❌ [{orig_i+1}] KILLED: {url[:50]}... ({reason})")
-                
-                tasks = []
-                await asyncio.sleep(1)
+    for i, (url, result) in enumerate(zip(urls, results)):
+        if result is not None and result[0] and i not in mirrors:
+            survivors.append(url)
 
-    # 3. Запись
-    with open(INPUT_FILE, "w", encoding="utf-8") as f:
-        for url in survivors:
-            f.write(url + "\n")
+    # 3. Запись (временный файл + атомарная подмена — падение не обрежет список)
+    atomic_write_lines(INPUT_FILE, survivors)
+    checkpoint.remove()
 
     killed = len(urls) - len(survivors)
     logger.info("="*40)
     logger.info(f"🪦 GENOCIDE COMPLETED:")
     logger.info(f"  Before: {len(urls)}")
     logger.info(f"  Killed:  {killed}")
+    logger.info(f"  Mirrors: {len(mirrors)}")
     logger.info(f"  Alive:   {len(survivors)}")
     logger.info("="*40)
 
@@ -0,0 +1,285 @@
+import time
+import sqlite3
+
+# --- PERSISTENT CRAWL STATE ---
+# Хранилище состояния между запусками (лежит рядом с verified_ru.txt).
+# Для каждого URL помним: когда качали, хеш контента, вердикт и число нод.
+# Запуск перекачивает только те URL, у которых истёк интервал перепроверки.
+
+STATE_DB_FILE = "crawl_state.db"
+
+# Интервалы перепроверки по вердикту (секунды)
+RECHECK_INTERVALS = {
+    "clean": 12 * 3600,
+    "aggregator": 24 * 3600,
+    "duplicate": 3 * 86400,
+    "trash": 3 * 86400,
+    "dead": 2 * 86400,
+    "error": 3 * 3600,
+}
+DEFAULT_RECHECK = 6 * 3600
+
+# Записи, которые не трогали дольше этого срока, выкидываем
+PRUNE_AFTER = 30 * 86400
+
+COMMIT_EVERY = 200
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS urls (
+    url TEXT PRIMARY KEY,
+    last_fetch INTEGER NOT NULL,
+    content_hash TEXT,
+    verdict TEXT NOT NULL,
+    tag TEXT,
+    node_count INTEGER NOT NULL DEFAULT 0,
+    etag TEXT,
+    last_modified TEXT,
+    signature BLOB
+);
+CREATE TABLE IF NOT EXISTS fingerprints (
+    fingerprint TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    first_seen INTEGER NOT NULL,
+    last_seen INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_fingerprints_url ON fingerprints(url);
+CREATE TABLE IF NOT EXISTS query_stats (
+    query TEXT PRIMARY KEY,
+    runs INTEGER NOT NULL DEFAULT 0,
+    requests INTEGER NOT NULL DEFAULT 0,
+    new_urls INTEGER NOT NULL DEFAULT 0,
+    clean_sources INTEGER NOT NULL DEFAULT 0,
+    nodes INTEGER NOT NULL DEFAULT 0,
+    yield_score REAL NOT NULL DEFAULT 0,
+    zero_streak INTEGER NOT NULL DEFAULT 0,
+    skip_until INTEGER NOT NULL DEFAULT 0,
+    last_run INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS dead_prefixes (
+    prefix TEXT PRIMARY KEY,
+    until INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS health (
+    url TEXT PRIMARY KEY,
+    consecutive_failures INTEGER NOT NULL DEFAULT 0,
+    ok_streak INTEGER NOT NULL DEFAULT 0,
+    failing_since INTEGER,
+    last_success INTEGER,
+    latency_ms REAL,
+    next_check INTEGER NOT NULL DEFAULT 0,
+    last_reason TEXT
+);
+CREATE TABLE IF NOT EXISTS ai_verdicts (
+    snippet_key TEXT PRIMARY KEY,
+    verdict TEXT NOT NULL,
+    reason TEXT,
+    created INTEGER NOT NULL
+);
+"""
+
+# Колонки, добавленные после первой версии схемы (миграция старых баз)
+_MIGRATIONS = {
+    "urls": [("etag", "TEXT"), ("last_modified", "TEXT"), ("signature", "BLOB")],
+}
+
+
+class CrawlState:
+    def __init__(self, path=STATE_DB_FILE):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(_SCHEMA)
+        self._migrate()
+        self._pending = 0
+
+    def _migrate(self):
+        for table, columns in _MIGRATIONS.items():
+            existing = {row[1] for row in self.conn.execute(f"PRAGMA table_info({table})")}
+            for name, col_type in columns:
+                if name not in existing:
+                    self.conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {col_type}")
+
+    def get(self, url):
+        """Возвращает сохранённую запись по URL или None."""
+        row = self.conn.execute(
+            "SELECT last_fetch, content_hash, verdict, tag, node_count, etag, last_modified, signature "
+            "FROM urls WHERE url = ?",
+            (url,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {
+            "last_fetch": row[0], "content_hash": row[1], "verdict": row[2],
+            "tag": row[3], "node_count": row[4], "etag": row[5], "last_modified": row[6],
+            "signature": row[7]
+        }
+
+    def conditional_headers(self, url):
+        """Заголовки If-None-Match / If-Modified-Since по сохранённым валидаторам."""
+        entry = self.get(url)
+        headers = {}
+        if entry is None:
+            return headers, None
+        if entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        if entry["last_modified"]:
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers, entry
+
+    def is_fresh(self, url, now=None):
+        """True, если URL качали недавно и интервал перепроверки ещё не истёк."""
+        entry = self.get(url)
+        if entry is None:
+            return False
+        now = now or int(time.time())
+        interval = RECHECK_INTERVALS.get(entry["verdict"], DEFAULT_RECHECK)
+        return now - entry["last_fetch"] < interval
+
+    def record(self, url, verdict, node_count=0, content_hash=None, tag=None, fingerprints=(),
+               etag=None, last_modified=None, signature=None):
+        now = int(time.time())
+        self.conn.execute(
+            "INSERT OR REPLACE INTO urls "
+            "(url, last_fetch, content_hash, verdict, tag, node_count, etag, last_modified, signature) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (url, now, content_hash, verdict, tag, node_count, etag, last_modified, signature)
+        )
+        if fingerprints:
+            self.conn.executemany(
+                "INSERT INTO fingerprints (fingerprint, url, first_seen, last_seen) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(fingerprint) DO UPDATE SET url = excluded.url, last_seen = excluded.last_seen",
+                [(fp, url, now, now) for fp in fingerprints]
+            )
+        self._pending += 1
+        if self._pending >= COMMIT_EVERY:
+            self.commit()
+
+    def touch(self, url):
+        """Ответ 304: контент не менялся, обновляем только время проверки."""
+        now = int(time.time())
+        self.conn.execute("UPDATE urls SET last_fetch = ? WHERE url = ?", (now, url))
+        self.conn.execute("UPDATE fingerprints SET last_seen = ? WHERE url = ?", (now, url))
+        self._pending += 1
+        if self._pending >= COMMIT_EVERY:
+            self.commit()
+
+    def load_query_stats(self):
+        """{query: {колонки query_stats}} по всем запросам, что уже запускались."""
+        cursor = self.conn.execute("SELECT * FROM query_stats")
+        columns = [c[0] for c in cursor.description]
+        return {row[0]: dict(zip(columns, row)) for row in cursor}
+
+    def save_query_stats(self, entry):
+        columns = list(entry)
+        self.conn.execute(
+            f"INSERT OR REPLACE INTO query_stats ({', '.join(columns)}) "
+            f"VALUES ({', '.join('?' for _ in columns)})",
+            [entry[c] for c in columns]
+        )
+
+    def is_dead_prefix(self, prefix, now=None):
+        """True, если перебор по префиксу недавно не дал ни одного файла."""
+        row = self.conn.execute("SELECT until FROM dead_prefixes WHERE prefix = ?", (prefix,)).fetchone()
+        return row is not None and row[0] > (now or int(time.time()))
+
+    def mark_dead_prefix(self, prefix, ttl):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO dead_prefixes (prefix, until) VALUES (?, ?)",
+            (prefix, int(time.time()) + ttl)
+        )
+
+    def get_health(self, url):
+        """История живости URL (колонки health) или None."""
+        cursor = self.conn.execute("SELECT * FROM health WHERE url = ?", (url,))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        return dict(zip([c[0] for c in cursor.description], row))
+
+    def save_health(self, entry):
+        columns = list(entry)
+        self.conn.execute(
+            f"INSERT OR REPLACE INTO health ({', '.join(columns)}) "
+            f"VALUES ({', '.join('?' for _ in columns)})",
+            [entry[c] for c in columns]
+        )
+        self._pending += 1
+        if self._pending >= COMMIT_EVERY:
+            self.commit()
+
+    def forget_health(self, url):
+        self.conn.execute("DELETE FROM health WHERE url = ?", (url,))
+
+    def get_ai_verdict(self, key, ttl):
+        """(verdict, reason) из кеша классификатора, если запись моложе ttl."""
+        row = self.conn.execute(
+            "SELECT verdict, reason, created FROM ai_verdicts WHERE snippet_key = ?", (key,)
+        ).fetchone()
+        if row is None or int(time.time()) - row[2] >= ttl:
+            return None
+        return row[0], row[1]
+
+    def put_ai_verdict(self, key, verdict, reason):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO ai_verdicts (snippet_key, verdict, reason, created) VALUES (?, ?, ?, ?)",
+            (key, verdict, reason, int(time.time()))
+        )
+
+    def fingerprints_of(self, url):
+        return [row[0] for row in self.conn.execute("SELECT fingerprint FROM fingerprints WHERE url = ?", (url,))]
+
+    def merge_from(self, path):
+        """
+        Вливает состояние шарда (копия этой же базы после обхода своего раздела):
+        по URL побеждает более свежая проверка, по отпечатку — последнее появление.
+        query_stats и health шарды не пишут — их сливает merge отдельно / ведёт cleaner.
+        """
+        self.commit()
+        self.conn.execute("ATTACH DATABASE ? AS shard", (path,))
+        try:
+            url_columns = [row[1] for row in self.conn.execute("PRAGMA main.table_info(urls)")]
+            shard_columns = {row[1] for row in self.conn.execute("PRAGMA shard.table_info(urls)")}
+            columns = [c for c in url_columns if c in shard_columns]
+            self.conn.execute(
+                f"INSERT OR REPLACE INTO main.urls ({', '.join(columns)}) "
+                f"SELECT {', '.join('s.' + c for c in columns)} FROM shard.urls s "
+                "LEFT JOIN main.urls m ON m.url = s.url "
+                "WHERE m.url IS NULL OR s.last_fetch > m.last_fetch"
+            )
+            self.conn.execute(
+                "INSERT INTO main.fingerprints (fingerprint, url, first_seen, last_seen) "
+                "SELECT fingerprint, url, first_seen, last_seen FROM shard.fingerprints WHERE true "
+                "ON CONFLICT(fingerprint) DO UPDATE SET "
+                "url = CASE WHEN excluded.last_seen > last_seen THEN excluded.url ELSE url END, "
+                "first_seen = MIN(first_seen, excluded.first_seen), "
+                "last_seen = MAX(last_seen, excluded.last_seen)"
+            )
+            self.conn.execute(
+                "INSERT INTO main.dead_prefixes (prefix, until) SELECT prefix, until FROM shard.dead_prefixes WHERE true "
+                "ON CONFLICT(prefix) DO UPDATE SET until = MAX(until, excluded.until)"
+            )
+            self.conn.execute(
+                "INSERT INTO main.ai_verdicts (snippet_key, verdict, reason, created) "
+                "SELECT snippet_key, verdict, reason, created FROM shard.ai_verdicts WHERE true "
+                "ON CONFLICT(snippet_key) DO UPDATE SET "
+                "verdict = excluded.verdict, reason = excluded.reason, created = excluded.created "
+                "WHERE excluded.created > created"
+            )
+            self.conn.commit()
+        finally:
+            self.conn.execute("DETACH DATABASE shard")
+
+    def prune(self, max_age=PRUNE_AFTER):
+        now = int(time.time())
+        cutoff = now - max_age
+        self.conn.execute("DELETE FROM dead_prefixes WHERE until < ?", (now,))
+        self.conn.execute("DELETE FROM ai_verdicts WHERE created < ?", (cutoff,))
+        self.conn.execute("DELETE FROM urls WHERE last_fetch < ?", (cutoff,))
+        self.conn.execute("DELETE FROM fingerprints WHERE last_seen < ?", (cutoff,))
+
+    def commit(self):
+        self.conn.commit()
+        self._pending = 0
+
+    def close(self):
+        self.commit()
+        self.conn.close()
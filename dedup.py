@@ -0,0 +1,78 @@
+import struct
+import hashlib
+
+# --- NEAR-DUPLICATE SOURCES (MinHash + LSH) ---
+# Источник = множество нормализованных отпечатков нод. Зеркала и форки
+# одной подписки дают почти одинаковые множества, даже если порядок строк,
+# комментарии и часть нод отличаются. Сравниваем MinHash-подписи, кандидатов
+# ищем через LSH-бакеты, а не попарно.
+
+NUM_PERM = 32
+BANDS = 8                      # 8 полос по 4 строки: порог LSH ~0.6
+ROWS = NUM_PERM // BANDS
+DUP_THRESHOLD = 0.8            # оценка Жаккара, начиная с которой считаем дублем
+
+_PRIME = (1 << 61) - 1
+_MASK32 = 0xFFFFFFFF
+
+
+def _hash61(value):
+    digest = hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") & _PRIME
+
+
+# Фиксированные a*x + b (mod p) — подписи сравнимы между запусками
+_PERMS = [
+    (_hash61(f"minhash-a-{i}") | 1, _hash61(f"minhash-b-{i}"))
+    for i in range(NUM_PERM)
+]
+
+
+def minhash_signature(fingerprints):
+    """MinHash-подпись множества отпечатков (bytes) или None для пустого."""
+    hashes = [_hash61(fp) for fp in set(fingerprints)]
+    if not hashes:
+        return None
+    values = [min((a * h + b) % _PRIME for h in hashes) & _MASK32 for a, b in _PERMS]
+    return struct.pack(f">{NUM_PERM}I", *values)
+
+
+def estimate_jaccard(sig_a, sig_b):
+    a = struct.unpack(f">{NUM_PERM}I", sig_a)
+    b = struct.unpack(f">{NUM_PERM}I", sig_b)
+    return sum(1 for x, y in zip(a, b) if x == y) / NUM_PERM
+
+
+def cluster_duplicates(signatures, threshold=DUP_THRESHOLD):
+    """
+    signatures: {key: signature}. Возвращает список кластеров-дублей
+    (списки ключей, в каждом 2+ элемента, в порядке signatures).
+    """
+    parent = {key: key for key, sig in signatures.items() if sig is not None}
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    buckets = {}
+    for key in parent:
+        sig = signatures[key]
+        for band in range(BANDS):
+            chunk = sig[band * ROWS * 4:(band + 1) * ROWS * 4]
+            buckets.setdefault((band, chunk), []).append(key)
+
+    for members in buckets.values():
+        head = members[0]
+        for other in members[1:]:
+            root_a, root_b = find(head), find(other)
+            if root_a == root_b:
+                continue
+            if estimate_jaccard(signatures[head], signatures[other]) >= threshold:
+                parent[root_b] = root_a
+
+    groups = {}
+    for key in parent:
+        groups.setdefault(find(key), []).append(key)
+    return [members for members in groups.values() if len(members) > 1]
@@ -0,0 +1,170 @@
+import heapq
+import asyncio
+import itertools
+import urllib.parse
+
+# --- CRAWL FRONTIER ---
+# Очередь с приоритетами вместо FIFO asyncio.Queue. Сначала качаем то, что
+# вероятнее даст чистый источник: результаты дорков, потом потомков
+# агрегаторов, и только в конце угаданные S3/числовые вариации.
+# API как у asyncio.Queue (put/get/task_done/join), плюс:
+#   - честность по хостам: не больше HOST_ACTIVE_LIMIT запросов к хосту
+#     одновременно, и каждый следующий URL того же хоста чуть ниже в очереди
+#     (не больше чем на HOST_FANOUT_MAX — внутри своего вида, угаданная
+#     вариация никогда не обгонит результат дорка);
+#   - глобальный бюджет скачиваний: когда он исчерпан, остаток очереди
+#     выбрасывается и join() завершается.
+# Внутри — по куче на хост и общая куча «голов» хостов: хост, упёршийся в
+# лимит, выпадает из общей кучи до task_done, и get() его не перебирает.
+
+KIND_SCORES = {
+    "seed": 100,        # результат дорка
+    "gist": 90,         # лента гистов
+    "aggregator": 70,   # ссылка из агрегатора
+    "sub": 60,          # ссылка на подписку из чистого файла
+    "hidden": 50,       # /sub?, /api/, download...
+    "variation": 20,    # угаданный соседний файл / S3-брутфорс
+}
+DEPTH_PENALTY = 10
+HOST_HISTORY_WEIGHT = 30     # доля чистых среди скачанных с хоста (0..1)
+YIELD_WEIGHT = 20            # выхлоп дорка-предка из QueryPlanner
+HOST_FANOUT_PENALTY = 0.5    # за каждый URL того же хоста, ждущий в очереди
+HOST_FANOUT_MAX = 5          # меньше шага между KIND_SCORES
+HOST_ACTIVE_LIMIT = 8
+
+# Статусы, при которых реального скачивания не было
+NO_FETCH_STATUSES = ("duplicate", "cached")
+
+
+def url_host(url):
+    return urllib.parse.urlparse(url).netloc.lower()
+
+
+class Frontier:
+    def __init__(self, budget=None, yield_lookup=None, host_active_limit=HOST_ACTIVE_LIMIT):
+        self.budget = budget or None
+        self.yield_lookup = yield_lookup
+        self.host_active_limit = host_active_limit
+        self.fetches = 0
+        self.dropped = 0
+        self._size = 0
+        self._hosts = {}     # host -> куча (-score, n, item)
+        self._ready = []     # куча (-score, n, host) голов хостов ниже лимита; устаревшие пропускаются
+        self._counter = itertools.count()
+        self._unfinished = 0
+        self._finished = asyncio.Event()
+        self._finished.set()
+        self._changed = asyncio.Condition()
+        self._active = {}
+        self._host_history = {}
+
+    def __len__(self):
+        return self._size
+
+    def empty(self):
+        return not self._size
+
+    def score(self, url, source_tag, depth, kind):
+        host = url_host(url)
+        fetched, clean = self._host_history.get(host, (0, 0))
+        host_rate = (clean + 1) / (fetched + 2)
+        past_yield = self.yield_lookup(source_tag) if self.yield_lookup else 0
+        waiting = len(self._hosts.get(host, ()))
+        return (
+            KIND_SCORES.get(kind, 0)
+            - DEPTH_PENALTY * depth
+            + HOST_HISTORY_WEIGHT * host_rate
+            + YIELD_WEIGHT * min(past_yield, 1.0)
+            - min(HOST_FANOUT_PENALTY * waiting, HOST_FANOUT_MAX)
+        )
+
+    def _offer(self, host):
+        """Голова очереди хоста — в общую кучу, если хост не упёрся в лимит."""
+        queue = self._hosts.get(host)
+        if queue and self._active.get(host, 0) < self.host_active_limit:
+            head = queue[0]
+            heapq.heappush(self._ready, (head[0], head[1], host))
+
+    def put_nowait(self, item, kind="seed"):
+        url, source_tag, depth = item
+        if self.budget is not None and self.fetches >= self.budget:
+            self.dropped += 1
+            return
+        host = url_host(url)
+        entry = (-self.score(url, source_tag, depth, kind), next(self._counter), item)
+        queue = self._hosts.setdefault(host, [])
+        heapq.heappush(queue, entry)
+        if queue[0] is entry:
+            self._offer(host)
+        self._size += 1
+        self._unfinished += 1
+        self._finished.clear()
+
+    async def put(self, item, kind="seed"):
+        self.put_nowait(item, kind)
+        async with self._changed:
+            self._changed.notify()
+
+    def _pop_eligible(self):
+        """Лучший элемент, чей хост не упёрся в лимит активных запросов."""
+        while self._ready:
+            _, n, host = heapq.heappop(self._ready)
+            queue = self._hosts.get(host)
+            if not queue or queue[0][1] != n:
+                continue  # голова хоста уже сменилась
+            if self._active.get(host, 0) >= self.host_active_limit:
+                continue  # вернётся через task_done
+            entry = heapq.heappop(queue)
+            if queue:
+                self._offer(host)
+            else:
+                del self._hosts[host]
+            self._size -= 1
+            return entry
+        return None
+
+    async def get(self):
+        async with self._changed:
+            while True:
+                if self.budget is not None and self.fetches >= self.budget and self._size:
+                    self._drop_all()
+                entry = self._pop_eligible()
+                if entry is not None:
+                    item = entry[2]
+                    host = url_host(item[0])
+                    self._active[host] = self._active.get(host, 0) + 1
+                    return item
+                await self._changed.wait()
+
+    def _drop_all(self):
+        self.dropped += self._size
+        self._unfinished -= self._size
+        self._size = 0
+        self._hosts.clear()
+        self._ready.clear()
+        if self._unfinished <= 0:
+            self._finished.set()
+
+    def record_result(self, url, status):
+        """История хоста и расход бюджета — по фактическому результату скачивания."""
+        if status in NO_FETCH_STATUSES:
+            return
+        self.fetches += 1
+        host = url_host(url)
+        fetched, clean = self._host_history.get(host, (0, 0))
+        self._host_history[host] = (fetched + 1, clean + (status == "clean"))
+
+    async def task_done(self, item):
+        host = url_host(item[0])
+        active = self._active.get(host, 0)
+        self._active[host] = max(0, active - 1)
+        if active >= self.host_active_limit:
+            self._offer(host)
+        self._unfinished -= 1
+        if self._unfinished <= 0:
+            self._finished.set()
+        async with self._changed:
+            self._changed.notify_all()
+
+    async def join(self):
+        await self._finished.wait()
@@ -0,0 +1,165 @@
+import re
+import codecs
+import random
+import logging
+
+import aiohttp
+
+logger = logging.getLogger("HttpClient")
+
+# --- SHARED CLIENT SESSION ---
+# Один настроенный клиент для scout.py и cleaner.py: общий пул соединений,
+# лимит на хост (чтобы 40 воркеров не долбили один S3-бакет), keep-alive,
+# кеш DNS и сжатие. Статистика переиспользования соединений по хостам.
+
+POOL_LIMIT = 100
+LIMIT_PER_HOST = 10
+DNS_CACHE_TTL = 600
+KEEPALIVE_TIMEOUT = 30
+
+USER_AGENTS = [
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.3 Safari/605.1.15",
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (iPhone; CPU iPhone OS 17_2 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.2 Mobile/15E148 Safari/604.1"
+]
+
+
+class HostStats:
+    """Счётчики по хостам: запросы, новые соединения, переиспользованные."""
+
+    def __init__(self):
+        self.hosts = {}
+
+    def _bump(self, host, key):
+        entry = self.hosts.setdefault(host, {"requests": 0, "new_connections": 0, "reused": 0})
+        entry[key] += 1
+
+    def trace_config(self):
+        trace = aiohttp.TraceConfig()
+
+        async def on_request_start(session, ctx, params):
+            ctx.host = params.url.host
+            self._bump(ctx.host, "requests")
+
+        async def on_connection_create_end(session, ctx, params):
+            self._bump(getattr(ctx, "host", None), "new_connections")
+
+        async def on_connection_reuseconn(session, ctx, params):
+            self._bump(getattr(ctx, "host", None), "reused")
+
+        trace.on_request_start.append(on_request_start)
+        trace.on_connection_create_end.append(on_connection_create_end)
+        trace.on_connection_reuseconn.append(on_connection_reuseconn)
+        return trace
+
+    def log_summary(self, top=10):
+        busiest = sorted(self.hosts.items(), key=lambda kv: kv[1]["requests"], reverse=True)[:top]
+        if not busiest:
+            return
+        logger.info("🔌 Connection reuse by host:")
+        for host, entry in busiest:
+            total = entry["new_connections"] + entry["reused"]
+            ratio = entry["reused"] / total if total else 0
+            logger.info(
+                f"   {host}: {entry['requests']} req, {entry['new_connections']} new, "
+                f"{entry['reused']} reused ({ratio:.0%})"
+            )
+
+
+def create_session(limit=POOL_LIMIT, limit_per_host=LIMIT_PER_HOST, stats=None):
+    """ClientSession с настроенным TCPConnector. User-Agent выбирается один раз на сессию."""
+    connector = aiohttp.TCPConnector(
+        limit=limit,
+        limit_per_host=limit_per_host,
+        use_dns_cache=True,
+        ttl_dns_cache=DNS_CACHE_TTL,
+        keepalive_timeout=KEEPALIVE_TIMEOUT,
+    )
+    headers = {
+        "User-Agent": random.choice(USER_AGENTS),
+        "Accept-Encoding": "gzip, deflate",
+    }
+    trace_configs = [stats.trace_config()] if stats is not None else None
+    return aiohttp.ClientSession(
+        connector=connector,
+        headers=headers,
+        auto_decompress=True,
+        trace_configs=trace_configs,
+    )
+
+# --- STREAMING BODY READER ---
+# Вместо resp.text(): читаем ответ кусками, держим лимит по размеру и
+# отбрасываем мусор (HTML-404, бинарники, арабские списки) по первому куску,
+# не скачивая остальное.
+
+MAX_BODY_BYTES = 8 * 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+
+# Content-Type, которые точно не подписка
+REJECT_CONTENT_TYPES = (
+    "image/", "video/", "audio/", "font/",
+    "application/zip", "application/x-tar", "application/gzip", "application/x-gzip",
+    "application/pdf", "application/x-executable", "application/vnd.",
+)
+HTML_MARKERS = ("<!doctype html", "<html")
+ARABIC_REGEX = re.compile(r'[\u0600-\u06FF]')
+
+
+class BodyRejected(Exception):
+    """Тело ответа отброшено до полного скачивания."""
+
+    def __init__(self, reason):
+        super().__init__(reason)
+        self.reason = reason
+
+
+def check_headers(resp, max_bytes=MAX_BODY_BYTES, reject_html=False):
+    ctype = resp.headers.get("Content-Type", "").lower()
+    if ctype.startswith(REJECT_CONTENT_TYPES):
+        raise BodyRejected(f"Content-Type {ctype.split(';')[0]}")
+    if reject_html and ctype.startswith("text/html"):
+        raise BodyRejected("HTML Page (likely 404)")
+    length = resp.headers.get("Content-Length")
+    if length and length.isdigit() and int(length) > max_bytes:
+        raise BodyRejected(f"Too large ({int(length) // 1024} KB)")
+
+
+def check_first_chunk(text, reject_html=True, reject_arabic=False):
+    if reject_html:
+        head = text[:2048].lower()
+        if any(m in head for m in HTML_MARKERS):
+            raise BodyRejected("HTML Page (likely 404)")
+    if reject_arabic and ARABIC_REGEX.search(text):
+        raise BodyRejected("Arabic")
+
+
+async def read_text_capped(resp, max_bytes=MAX_BODY_BYTES, reject_html=True, reject_arabic=False):
+    """
+    Читает тело ответа кусками по CHUNK_SIZE, декодирует инкрементально.
+    Бросает BodyRejected при превышении max_bytes или при мусоре в первом куске.
+    """
+    check_headers(resp, max_bytes, reject_html)
+
+    try:
+        decoder = codecs.getincrementaldecoder(resp.charset or "utf-8")(errors="ignore")
+    except LookupError:
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+
+    parts = []
+    total = 0
+    first = True
+    async for chunk in resp.content.iter_chunked(CHUNK_SIZE):
+        total += len(chunk)
+        if total > max_bytes:
+            raise BodyRejected(f"Too large (>{max_bytes // 1024} KB)")
+        text = decoder.decode(chunk)
+        if first and text:
+            check_first_chunk(text, reject_html, reject_arabic)
+            first = False
+        parts.append(text)
+
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        parts.append(tail)
+    return "".join(parts)
@@ -0,0 +1,145 @@
+import os
+import time
+import heapq
+import asyncio
+import logging
+
+logger = logging.getLogger("ListWriter")
+
+# --- CRASH-SAFE LIST WRITER ---
+# Вместо smart_merge_and_save в самом конце запуска: найденные URL сразу
+# дописываются в журнал рядом со списком (verified_ru.journal.txt), отдельной
+# задачей-писателем. В конце журнал сливается со списком потоковым
+# слиянием двух отсортированных последовательностей во временный файл,
+# который атомарно подменяет список (os.replace). Если запуск упал или
+# упёрся в таймаут, журнал остаётся и сливается при следующем старте.
+# В памяти держится только журнал одного запуска, не весь список.
+
+JOURNAL_SUFFIX = ".journal.txt"
+FSYNC_INTERVAL = 5.0
+
+
+def journal_path(list_path):
+    root, _ = os.path.splitext(list_path)
+    return root + JOURNAL_SUFFIX
+
+
+def _read_lines(path):
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield line
+
+
+def _is_sorted(path):
+    prev = None
+    for line in _read_lines(path):
+        if prev is not None and line < prev:
+            return False
+        prev = line
+    return True
+
+
+def atomic_write_lines(path, lines):
+    """Пишет строки во временный файл рядом с path и атомарно подменяет path. Возвращает число строк."""
+    tmp_path = f"{path}.tmp"
+    count = 0
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for line in lines:
+            f.write(line + "\n")
+            count += 1
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return count
+
+
+def merge_sorted(list_path, new_lines):
+    """
+    Сливает отсортированный список list_path с new_lines (без дублей) и
+    атомарно перезаписывает список. Возвращает (добавлено, всего).
+    """
+    new_sorted = sorted(set(new_lines))
+    if os.path.exists(list_path):
+        if _is_sorted(list_path):
+            existing = _read_lines(list_path)
+        else:
+            # Список правили руками — один раз сортируем в памяти, дальше снова потоково
+            logger.warning(f"⚠️ {list_path} is not sorted, sorting in memory")
+            existing = iter(sorted(set(_read_lines(list_path))))
+    else:
+        existing = iter(())
+
+    counts = {"added": 0}
+
+    def unique():
+        # (строка, 0) из списка идёт раньше (строка, 1) из новых — уже известные не считаются
+        prev = None
+        merged = heapq.merge(((line, 0) for line in existing), ((line, 1) for line in new_sorted))
+        for line, is_new in merged:
+            if line == prev:
+                continue
+            prev = line
+            counts["added"] += is_new
+            yield line
+
+    total = atomic_write_lines(list_path, unique())
+    return counts["added"], total
+
+
+def merge_journal(list_path):
+    """Сливает журнал в список и удаляет журнал. (добавлено, всего) или None, если журнала нет."""
+    path = journal_path(list_path)
+    if not os.path.exists(path):
+        return None
+    result = merge_sorted(list_path, _read_lines(path))
+    os.remove(path)
+    return result
+
+
+class ListJournal:
+    """Журнал новых URL одного списка с фоновой задачей-писателем."""
+
+    def __init__(self, list_path):
+        self.list_path = list_path
+        self.path = journal_path(list_path)
+        self.queue = asyncio.Queue()
+        self.count = 0
+        self._file = None
+        self._task = None
+
+    async def start(self):
+        recovered = merge_journal(self.list_path)
+        if recovered is not None:
+            logger.info(f"♻️ Recovered journal of an interrupted run: {recovered[0]} new in {self.list_path}")
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._task = asyncio.create_task(self._run())
+
+    def add(self, url):
+        self.count += 1
+        self.queue.put_nowait(url)
+
+    async def _run(self):
+        last_sync = time.monotonic()
+        while True:
+            lines = [await self.queue.get()]
+            while not self.queue.empty():
+                lines.append(self.queue.get_nowait())
+            self._file.write("".join(line + "\n" for line in lines))
+            self._file.flush()
+            if time.monotonic() - last_sync >= FSYNC_INTERVAL:
+                os.fsync(self._file.fileno())
+                last_sync = time.monotonic()
+            for _ in lines:
+                self.queue.task_done()
+
+    async def finish(self):
+        """Дописывает очередь, сливает журнал со списком. (добавлено, всего) или None, если новых нет."""
+        await self.queue.join()
+        self._task.cancel()
+        self._file.close()
+        if self.count == 0:
+            os.remove(self.path)
+            return None
+        return merge_journal(self.list_path)
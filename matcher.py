@@ -0,0 +1,47 @@
+try:
+    import ahocorasick
+except ImportError:  # pyahocorasick не установлен — работаем на обычных подстроках
+    ahocorasick = None
+
+# --- MULTI-PATTERN MATCHER ---
+# Один проход по тексту вместо any(x in s for x in LIST) на каждый список.
+# Основной движок — автомат Ахо-Корасик (pyahocorasick): находит все
+# вхождения всех ключей всех категорий за один проход, включая
+# пересекающиеся, так что результат совпадает с any()/sum() по спискам.
+# Без pyahocorasick используется запасной вариант на str.__contains__:
+# комбинированная регулярка в CPython оказалась медленнее обычных `in`.
+
+
+class KeywordMatcher:
+    def __init__(self, categories):
+        """categories: {"имя категории": [подстроки, ...]}. Регистр учитывается."""
+        self.categories = {name: tuple(dict.fromkeys(w for w in words if w))
+                           for name, words in categories.items()}
+        self._automaton = None
+
+        if ahocorasick is not None:
+            owners = {}
+            for name, words in self.categories.items():
+                for kw in words:
+                    owners.setdefault(kw, []).append(name)
+            if owners:
+                automaton = ahocorasick.Automaton()
+                for kw, names in owners.items():
+                    automaton.add_word(kw, (kw, tuple(names)))
+                automaton.make_automaton()
+                self._automaton = automaton
+
+    def scan(self, text):
+        """{категория: множество найденных ключей} — только для сработавших категорий."""
+        hits = {}
+        if self._automaton is not None:
+            for _, (kw, names) in self._automaton.iter(text):
+                for name in names:
+                    hits.setdefault(name, set()).add(kw)
+            return hits
+
+        for name, words in self.categories.items():
+            found = {kw for kw in words if kw in text}
+            if found:
+                hits[name] = found
+        return hits
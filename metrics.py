@@ -0,0 +1,216 @@
+import os
+import json
+import time
+import bisect
+import logging
+from contextlib import contextmanager
+
+logger = logging.getLogger("Metrics")
+
+# --- RUN METRICS ---
+# Счётчики и гистограммы задержек по стадиям конвейера (search, fetch,
+# decode, extract, classify, ai, save) с разбивкой по хосту и вердикту.
+# В конце запуска пишется JSON-отчёт (scout_report.json) и одна сводная
+# строка в историю запусков (scout_history.jsonl) — по ней видно тренды
+# между плановыми запусками. По SCOUT_PROM_FILE дополнительно пишется
+# текстовый файл в формате экспозиции Prometheus (node_exporter textfile).
+# Метки — кортеж пар (имя, значение), так что ключи хешируются без аллокаций
+# словарей на каждый inc().
+
+REPORT_FILE = os.getenv("SCOUT_REPORT_FILE", "scout_report.json")
+HISTORY_FILE = os.getenv("SCOUT_HISTORY_FILE", "scout_history.jsonl")
+PROM_FILE = os.getenv("SCOUT_PROM_FILE")
+# Сколько хостов попадает в отчёт (по числу запросов)
+REPORT_TOP_HOSTS = 25
+METRIC_PREFIX = "scout_"
+
+# Границы корзин гистограммы задержек, секунды
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # последняя — +Inf
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        """Оценка квантиля по корзинам: линейно внутри корзины, как histogram_quantile."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = min(self.buckets[i], self.max) if i < len(self.buckets) else self.max
+                return lower + (upper - lower) * (rank - seen) / n
+            seen += n
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "sum_s": round(self.sum, 3),
+            "avg_ms": round(self.sum / self.count * 1000, 2) if self.count else 0,
+            "p50_ms": round(self.quantile(0.5) * 1000, 2),
+            "p95_ms": round(self.quantile(0.95) * 1000, 2),
+            "max_ms": round(self.max * 1000, 2),
+        }
+
+
+def _labels(labels):
+    # Значения — строки: статус бывает и 200, и "error", а ключи сортируются в отчёте
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class Metrics:
+    def __init__(self):
+        self.started = time.time()
+        self.counters = {}
+        self.histograms = {}
+
+    def inc(self, name, value=1, **labels):
+        key = (name, _labels(labels))
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        key = (name, _labels(labels))
+        hist = self.histograms.get(key)
+        if hist is None:
+            hist = self.histograms[key] = Histogram()
+        hist.observe(seconds)
+
+    def stage(self, stage, seconds):
+        self.observe("stage_seconds", seconds, stage=stage)
+
+    @contextmanager
+    def timer(self, stage):
+        """with METRICS.timer("search"): ... — время стадии, в том числе через await."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stage(stage, time.perf_counter() - started)
+
+    def _histograms_by(self, name, label):
+        return {
+            dict(labels)[label]: hist.summary()
+            for (metric, labels), hist in self.histograms.items() if metric == name
+        }
+
+    def _by_label(self, name, label):
+        result = {}
+        for (metric, labels), value in self.counters.items():
+            if metric != name:
+                continue
+            labels = dict(labels)
+            result.setdefault(labels.get(label), {})[
+                ",".join(f"{k}={v}" for k, v in labels.items() if k != label) or "total"
+            ] = value
+        return result
+
+    def report(self, extra=None):
+        stages = self._histograms_by("stage_seconds", "stage")
+        phases = self._histograms_by("phase_seconds", "phase")
+        verdicts = {}
+        for (name, labels), value in self.counters.items():
+            if name == "verdicts_total":
+                verdict = dict(labels)["verdict"]
+                verdicts[verdict] = verdicts.get(verdict, 0) + value
+
+        hosts = self._by_label("host_requests_total", "host")
+        host_seconds = self._by_label("host_fetch_seconds_total", "host")
+        busiest = sorted(hosts.items(), key=lambda kv: sum(kv[1].values()), reverse=True)[:REPORT_TOP_HOSTS]
+        return {
+            "started": int(self.started),
+            "duration_s": round(time.time() - self.started, 1),
+            "phases": phases,
+            "stages": stages,
+            "verdicts": verdicts,
+            "hosts": {
+                host: {
+                    "requests": sum(by_status.values()),
+                    "by_status": {k.split("=", 1)[1]: v for k, v in by_status.items()},
+                    "fetch_s": round(host_seconds.get(host, {}).get("total", 0.0), 2),
+                }
+                for host, by_status in busiest
+            },
+            "counters": {
+                name + ("{" + ",".join(f"{k}={v}" for k, v in labels) + "}" if labels else ""): value
+                for (name, labels), value in sorted(self.counters.items())
+                if name not in ("host_requests_total", "host_fetch_seconds_total")
+            },
+            **(extra or {}),
+        }
+
+    def write_report(self, path=REPORT_FILE, history_path=HISTORY_FILE, extra=None):
+        report = self.report(extra)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        if history_path:
+            # В истории — только то, что сравнимо между запусками
+            line = {
+                "started": report["started"],
+                "duration_s": report["duration_s"],
+                "phases_s": {phase: s["sum_s"] for phase, s in report["phases"].items()},
+                "stages_s": {stage: s["sum_s"] for stage, s in report["stages"].items()},
+                "verdicts": report["verdicts"],
+                "stats": (extra or {}).get("stats"),
+            }
+            with open(history_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(line, ensure_ascii=False) + "\n")
+        logger.info(f"📈 Run report: {path}")
+        return report
+
+    def prometheus_text(self):
+        lines = []
+        typed = set()
+
+        def fmt(labels):
+            if not labels:
+                return ""
+            escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"') for _, v in labels)
+            return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(labels, escaped)) + "}"
+
+        for (name, labels), value in sorted(self.counters.items()):
+            metric = METRIC_PREFIX + name
+            if metric not in typed:
+                typed.add(metric)
+                lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric}{fmt(labels)} {value}")
+
+        for (name, labels), hist in sorted(self.histograms.items()):
+            metric = METRIC_PREFIX + name
+            if metric not in typed:
+                typed.add(metric)
+                lines.append(f"# TYPE {metric} histogram")
+            cumulative = 0
+            for bound, n in zip(list(hist.buckets) + ["+Inf"], hist.counts):
+                cumulative += n
+                lines.append(f"{metric}_bucket{fmt(labels + (('le', bound),))} {cumulative}")
+            lines.append(f"{metric}_sum{fmt(labels)} {hist.sum}")
+            lines.append(f"{metric}_count{fmt(labels)} {hist.count}")
+
+        lines.append(f"# TYPE {METRIC_PREFIX}run_started_seconds gauge")
+        lines.append(f"{METRIC_PREFIX}run_started_seconds {int(self.started)}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path=PROM_FILE):
+        if not path:
+            return
+        # textfile-коллектор читает файл целиком — подменяем атомарно
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp_path, path)
+        logger.info(f"📈 Prometheus metrics: {path}")
@@ -0,0 +1,157 @@
+import time
+import sqlite3
+import argparse
+
+# --- NODE STORE ---
+# Помимо списков URL scout складывает сами ноды в nodes.db: одна строка на
+# отпечаток (uuid:pbk / uuid:host), разобранные поля VlessNode, исходная
+# ссылка, источник и время первого/последнего появления. Потребителям не
+# нужно перекачивать тысячи файлов ради нод.
+# SQLite с индексами по sni/host/security и mmap: выборка идёт курсором,
+# без загрузки всей базы в память.
+#
+#   python node_store.py --sni gosuslugi.ru --security reality
+#   python node_store.py --host %.example.com --since 86400
+
+NODES_DB_FILE = "nodes.db"
+MMAP_SIZE = 256 * 1024 * 1024
+PRUNE_AFTER = 30 * 86400
+COMMIT_EVERY = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS nodes (
+    fingerprint TEXT PRIMARY KEY,
+    uuid TEXT NOT NULL,
+    host TEXT NOT NULL,
+    port INTEGER NOT NULL DEFAULT 0,
+    security TEXT,
+    type TEXT,
+    sni TEXT,
+    pbk TEXT,
+    sid TEXT,
+    flow TEXT,
+    fp TEXT,
+    link TEXT NOT NULL,
+    source TEXT NOT NULL,
+    tag TEXT,
+    first_seen INTEGER NOT NULL,
+    last_seen INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_nodes_sni ON nodes(sni);
+CREATE INDEX IF NOT EXISTS idx_nodes_host ON nodes(host);
+CREATE INDEX IF NOT EXISTS idx_nodes_security ON nodes(security);
+CREATE INDEX IF NOT EXISTS idx_nodes_source ON nodes(source);
+"""
+
+NODE_COLUMNS = ("fingerprint", "uuid", "host", "port", "security", "type", "sni", "pbk", "sid",
+                "flow", "fp", "link", "source", "tag", "first_seen", "last_seen")
+
+# Фильтры query(): колонка -> значение ('%' в значении — LIKE, иначе точное совпадение по индексу)
+QUERY_FIELDS = ("sni", "host", "security", "type", "source", "tag")
+
+
+class NodeStore:
+    def __init__(self, path=NODES_DB_FILE):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+        self.conn.executescript(_SCHEMA)
+        self._pending = 0
+
+    def upsert(self, node, link, source, tag=None, now=None):
+        """Новая нода или обновление last_seen/источника у уже известной."""
+        now = now or int(time.time())
+        self.conn.execute(
+            f"INSERT INTO nodes ({', '.join(NODE_COLUMNS)}) "
+            f"VALUES ({', '.join('?' for _ in NODE_COLUMNS)}) "
+            "ON CONFLICT(fingerprint) DO UPDATE SET "
+            "link = excluded.link, source = excluded.source, tag = excluded.tag, last_seen = excluded.last_seen",
+            (node.fingerprint(), node.uuid, node.host, node.port, node.security, node.type, node.sni,
+             node.pbk, node.sid, node.flow, node.fp, link, source, tag, now, now)
+        )
+        self._bump()
+
+    def touch_source(self, source, now=None):
+        """Источник не менялся (304) — его ноды всё ещё живы."""
+        self.conn.execute("UPDATE nodes SET last_seen = ? WHERE source = ?", (now or int(time.time()), source))
+        self._bump()
+
+    def _bump(self):
+        self._pending += 1
+        if self._pending >= COMMIT_EVERY:
+            self.commit()
+
+    def query(self, since=None, limit=None, **filters):
+        """Итератор словарей-нод. filters: sni=, host=, security=, type=, source=, tag=."""
+        clauses, args = [], []
+        for field, value in filters.items():
+            if field not in QUERY_FIELDS:
+                raise ValueError(f"Unknown node field: {field}")
+            if value is None:
+                continue
+            clauses.append(f"{field} LIKE ?" if "%" in value else f"{field} = ?")
+            args.append(value)
+        if since is not None:
+            clauses.append("last_seen >= ?")
+            args.append(int(time.time()) - since)
+        sql = f"SELECT {', '.join(NODE_COLUMNS)} FROM nodes"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY last_seen DESC"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        for row in self.conn.execute(sql, args):
+            yield dict(zip(NODE_COLUMNS, row))
+
+    def merge_from(self, path):
+        """Вливает nodes.db шарда: у известного отпечатка обновляется только более свежая запись."""
+        self.commit()
+        self.conn.execute("ATTACH DATABASE ? AS shard", (path,))
+        try:
+            self.conn.execute(
+                f"INSERT INTO main.nodes ({', '.join(NODE_COLUMNS)}) "
+                f"SELECT {', '.join(NODE_COLUMNS)} FROM shard.nodes WHERE true "
+                "ON CONFLICT(fingerprint) DO UPDATE SET "
+                "link = excluded.link, source = excluded.source, tag = excluded.tag, last_seen = excluded.last_seen "
+                "WHERE excluded.last_seen > last_seen"
+            )
+            self.conn.commit()
+        finally:
+            self.conn.execute("DETACH DATABASE shard")
+
+    def count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM nodes").fetchone()[0]
+
+    def prune(self, max_age=PRUNE_AFTER):
+        cutoff = int(time.time()) - max_age
+        self.conn.execute("DELETE FROM nodes WHERE last_seen < ?", (cutoff,))
+
+    def commit(self):
+        self.conn.commit()
+        self._pending = 0
+
+    def close(self):
+        self.commit()
+        self.conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Выборка нод из nodes.db (печатает ссылки)")
+    parser.add_argument("--db", default=NODES_DB_FILE)
+    for field in QUERY_FIELDS:
+        parser.add_argument(f"--{field}")
+    parser.add_argument("--since", type=int, help="только ноды, виденные за последние N секунд")
+    parser.add_argument("--limit", type=int)
+    args = parser.parse_args()
+
+    store = NodeStore(args.db)
+    try:
+        filters = {field: getattr(args, field) for field in QUERY_FIELDS}
+        for node in store.query(since=args.since, limit=args.limit, **filters):
+            print(node["link"])
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+import re
+
+# --- ADAPTIVE PROBING ---
+# Замена generate_variations: вместо 50-60 числовых соседей и всего
+# S3_COMMON_FILES на каждый хит догадки выдаются по несколько штук,
+# ближайшие к известному файлу первыми. Каждая последовательность
+# останавливается после MAX_MISSES промахов подряд, один и тот же префикс
+# не перебирается дважды за запуск, а префиксы без единого попадания
+# запоминаются в crawl_state и пропускаются в следующих запусках.
+# В режиме шарда (owns) догадки чужого раздела не выдаются вовсе: отложить
+# их нельзя (последовательность не дождётся результата), а выдать все
+# кандидаты в deferred — до сотни URL на префикс.
+
+NUMERIC_FILE_REGEX = re.compile(r'(\d+)\.(txt|json|yaml|conf|sub)$')
+
+PROBE_WINDOW = 2            # догадок одной последовательности одновременно в полёте
+MAX_MISSES = 4              # числовые соседи: промахов подряд до остановки
+MAX_MISSES_S3 = 8           # имена файлов в бакете: промахов подряд до остановки
+NUMERIC_WINDOW = 50          # соседей в каждую сторону от найденного номера
+DEAD_PREFIX_TTL = 7 * 86400
+
+HIT_STATUSES = ("clean", "aggregator", "trash")   # файл существует
+MISS_STATUSES = ("dead", "error")
+
+
+def numeric_candidates(base_num):
+    """base-1, base+1, base-2, base+2 ... в окне max(1, base-NUMERIC_WINDOW)..base+NUMERIC_WINDOW."""
+    for step in range(1, NUMERIC_WINDOW + 1):
+        for i in (base_num - step, base_num + step):
+            if i >= 1:
+                yield i
+
+
+class ProbeSequence:
+    def __init__(self, key, urls, max_misses, source_tag, depth):
+        self.key = key
+        self.urls = urls
+        self.max_misses = max_misses
+        self.source_tag = source_tag
+        self.depth = depth
+        self.misses = 0
+        self.hits = 0
+        self.in_flight = 0
+        self.sent = 0
+        self.done = False
+
+    def next_batch(self):
+        batch = []
+        while not self.done and self.in_flight < PROBE_WINDOW:
+            url = next(self.urls, None)
+            if url is None:
+                self.done = True
+                break
+            self.in_flight += 1
+            self.sent += 1
+            batch.append(url)
+        return batch
+
+
+class Prober:
+    def __init__(self, state=None, is_s3=None, common_files=(), owns=None):
+        self.state = state
+        self.is_s3 = is_s3
+        self.owns = owns
+        self.common_files = list(common_files)
+        self.started = set()
+        self.pending = {}
+        self.probes_sent = 0
+        self.sequences_stopped = 0
+
+    def _is_dead(self, key):
+        return self.state is not None and self.state.is_dead_prefix(key)
+
+    def _start(self, key, urls, max_misses, source_tag, depth):
+        if key in self.started or self._is_dead(key):
+            return []
+        self.started.add(key)
+        if self.owns is not None:
+            urls = (u for u in urls if self.owns(u))
+        seq = ProbeSequence(key, urls, max_misses, source_tag, depth)
+        return self._emit(seq)
+
+    def _emit(self, seq):
+        items = []
+        for url in seq.next_batch():
+            self.pending[url] = seq
+            items.append((url, seq.source_tag, seq.depth))
+        self.probes_sent += len(items)
+        if seq.done and seq.in_flight == 0:
+            self._finish(seq)
+        return items
+
+    def _finish(self, seq):
+        # Ни одной догадки (все в чужом шарде) — о префиксе ничего не узнали
+        if seq.hits == 0 and seq.sent and self.state is not None:
+            self.state.mark_dead_prefix(seq.key, DEAD_PREFIX_TTL)
+
+    def expand(self, url, source_tag, depth):
+        """Первые догадки для чистого хита url. Возвращает [(url, source_tag, depth)]."""
+        items = []
+
+        match = NUMERIC_FILE_REGEX.search(url)
+        if match:
+            base_num = int(match.group(1))
+            ext = match.group(2)
+            prefix = url[:match.start(1)]
+            urls = (f"{prefix}{i}.{ext}" for i in numeric_candidates(base_num))
+            items += self._start(f"num:{prefix}*.{ext}", urls, MAX_MISSES, source_tag, depth)
+
+        if self.is_s3 is not None and self.is_s3(url):
+            parts = url.split('/')
+            if len(parts) > 3:
+                base_path = "/".join(parts[:-1])
+                urls = (f"{base_path}/{name}" for name in self.common_files if name != parts[-1])
+                items += self._start(f"s3:{base_path}/", urls, MAX_MISSES_S3, source_tag, depth)
+
+        return items
+
+    def on_result(self, url, status):
+        """Результат догадки. Возвращает следующие догадки той же последовательности."""
+        seq = self.pending.pop(url, None)
+        if seq is None:
+            return []
+        seq.in_flight -= 1
+        if status in HIT_STATUSES:
+            seq.hits += 1
+            seq.misses = 0
+        elif status in MISS_STATUSES:
+            seq.misses += 1
+            if seq.misses >= seq.max_misses and not seq.done:
+                seq.done = True
+                self.sequences_stopped += 1
+        if seq.done:
+            if seq.in_flight == 0:
+                self._finish(seq)
+            return []
+        return self._emit(seq)
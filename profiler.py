@@ -0,0 +1,200 @@
+import os
+import time
+import heapq
+import asyncio
+import cProfile
+import pstats
+import logging
+from contextlib import contextmanager
+
+logger = logging.getLogger("Profiler")
+
+# --- PROFILER ---
+# Опциональный режим профилирования scout (SCOUT_PROFILE=1): отвечает на
+# вопрос «что тормозит — сеть, гигантские документы в event loop или AI».
+#   - LoopLag: фоновая задача, меряет, насколько позже запланированного
+#     просыпается event loop; долгие залипания (> LAG_STALL) считаются отдельно;
+#   - на каждый fetch_and_analyze — время скачивания, анализа и AI и исход
+#     (включая таймауты и ошибки — их время тоже попадает в топы);
+#   - топ-N самых медленных URL и хостов;
+#   - SCOUT_PROFILE_DIR=dir — снимки cProfile пути анализа (analyze_document)
+#     раз в PROFILE_SNAPSHOT_INTERVAL в dir/analysis-NNN.prof и итоговый
+#     dir/analysis.txt. Анализ тогда идёт в event loop, без пула процессов,
+#     иначе профиль его не увидит.
+# Выключенный профилировщик — это PROFILER = None в scout: одна проверка
+# на URL, без таймеров и задач.
+
+PROFILE_ENABLED = os.getenv("SCOUT_PROFILE", "") not in ("", "0")
+PROFILE_DIR = os.getenv("SCOUT_PROFILE_DIR")
+PROFILE_TOP = 15
+PROFILE_SNAPSHOT_INTERVAL = 60.0
+LAG_INTERVAL = 0.05
+# Залипание event loop, которое стоит считать отдельно
+LAG_STALL = 0.1
+# Исходы скачивания без документа — считаются у хоста отдельно
+FAILED_OUTCOMES = ("timeout", "error", "rejected")
+
+
+class LoopLag:
+    """Фоновая задача: насколько позже запланированного просыпается event loop."""
+
+    def __init__(self, interval=LAG_INTERVAL):
+        self.interval = interval
+        self.samples = []
+        self.stalls = 0
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - started - self.interval)
+            self.samples.append(lag)
+            if lag > LAG_STALL:
+                self.stalls += 1
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+
+    def summary(self):
+        lag = sorted(self.samples) or [0.0]
+        return {
+            "lag_p50_ms": round(lag[len(lag) // 2] * 1000, 2),
+            "lag_p99_ms": round(lag[min(len(lag) - 1, int(len(lag) * 0.99))] * 1000, 2),
+            "lag_max_ms": round(lag[-1] * 1000, 2),
+            "stalls": self.stalls,
+        }
+
+
+class Profiler:
+    def __init__(self, top=PROFILE_TOP, snapshot_dir=PROFILE_DIR):
+        self.top = top
+        self.snapshot_dir = snapshot_dir
+        self.lag = LoopLag()
+        self.notes = {}       # url -> {"analysis": s, "ai": s} до record()
+        self.slowest = []     # куча (total, url, entry) размера top
+        self.heaviest = []    # куча (analysis, url, entry) размера top
+        self.hosts = {}
+        self.profile = cProfile.Profile() if snapshot_dir else None
+        self.snapshots = 0
+        self._last_snapshot = time.monotonic()
+        if snapshot_dir:
+            os.makedirs(snapshot_dir, exist_ok=True)
+
+    @property
+    def cprofile(self):
+        return self.profile is not None
+
+    def start(self):
+        self.lag.start()
+
+    def note(self, url, part, seconds):
+        entry = self.notes.setdefault(url, {})
+        entry[part] = entry.get(part, 0.0) + seconds
+
+    def record(self, url, host, download, total, size, outcome=None):
+        """
+        Один fetch_and_analyze: скачивание, анализ/AI (из note()) и полное время.
+        outcome — вердикт или исход скачивания (timeout, error, 404, 304...).
+        """
+        parts = self.notes.pop(url, {})
+        entry = {
+            "outcome": outcome,
+            "total_s": round(total, 4),
+            "download_s": round(download, 4),
+            "analysis_s": round(parts.get("analysis", 0.0), 4),
+            "ai_s": round(parts.get("ai", 0.0), 4),
+            "size": size,
+        }
+        item = (total, url, entry)
+        if len(self.slowest) < self.top:
+            heapq.heappush(self.slowest, item)
+        elif total > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, item)
+        analysis = parts.get("analysis", 0.0)
+        if analysis:
+            item = (analysis, url, entry)
+            if len(self.heaviest) < self.top:
+                heapq.heappush(self.heaviest, item)
+            elif analysis > self.heaviest[0][0]:
+                heapq.heapreplace(self.heaviest, item)
+
+        agg = self.hosts.get(host)
+        if agg is None:
+            agg = self.hosts[host] = {"count": 0, "total_s": 0.0, "download_s": 0.0,
+                                      "analysis_s": 0.0, "ai_s": 0.0, "max_s": 0.0, "failed": 0}
+        agg["count"] += 1
+        if outcome in FAILED_OUTCOMES:
+            agg["failed"] += 1
+        agg["total_s"] += total
+        agg["download_s"] += download
+        agg["analysis_s"] += analysis
+        agg["ai_s"] += parts.get("ai", 0.0)
+        agg["max_s"] = max(agg["max_s"], total)
+
+    @contextmanager
+    def analysis(self):
+        """Обёртка синхронного анализа документа для снимков cProfile."""
+        if self.profile is None:
+            yield
+            return
+        self.profile.enable()
+        try:
+            yield
+        finally:
+            self.profile.disable()
+        if time.monotonic() - self._last_snapshot >= PROFILE_SNAPSHOT_INTERVAL:
+            self.snapshot()
+
+    def snapshot(self):
+        self.snapshots += 1
+        self._last_snapshot = time.monotonic()
+        path = os.path.join(self.snapshot_dir, f"analysis-{self.snapshots:03d}.prof")
+        self.profile.dump_stats(path)
+        return path
+
+    def stop(self):
+        self.lag.stop()
+        if self.profile is None:
+            return
+        self.snapshot()
+        with open(os.path.join(self.snapshot_dir, "analysis.txt"), "w", encoding="utf-8") as f:
+            stats = pstats.Stats(self.profile, stream=f)
+            stats.sort_stats("cumulative").print_stats(40)
+
+    def report(self):
+        hosts = sorted(self.hosts.items(), key=lambda kv: kv[1]["total_s"], reverse=True)[:self.top]
+        return {
+            **self.lag.summary(),
+            "slowest_urls": [{"url": url, **entry} for _, url, entry in sorted(self.slowest, reverse=True)],
+            "heaviest_analysis": [{"url": url, **entry} for _, url, entry in sorted(self.heaviest, reverse=True)],
+            "slowest_hosts": [
+                {"host": host, **{k: round(v, 3) if isinstance(v, float) else v for k, v in agg.items()}}
+                for host, agg in hosts
+            ],
+            "cprofile_snapshots": self.snapshots,
+        }
+
+    def log_summary(self, top=5):
+        lag = self.lag.summary()
+        logger.info(
+            f"⏱️ Event loop lag p50/p99/max: {lag['lag_p50_ms']}/{lag['lag_p99_ms']}/{lag['lag_max_ms']} ms, "
+            f"{lag['stalls']} stalls > {LAG_STALL * 1000:.0f} ms"
+        )
+        for total, url, entry in sorted(self.slowest, reverse=True)[:top]:
+            logger.info(
+                f"   🐢 {total:.2f}s {entry['outcome']} (download {entry['download_s']:.2f}, "
+                f"analysis {entry['analysis_s']:.3f}, AI {entry['ai_s']:.2f}, {entry['size']} chars): {url}"
+            )
+        for host, agg in sorted(self.hosts.items(), key=lambda kv: kv[1]["total_s"], reverse=True)[:top]:
+            logger.info(
+                f"   🌐 {host}: {agg['count']} URL ({agg['failed']} failed), {agg['total_s']:.1f}s total, "
+                f"download {agg['download_s']:.1f}s, analysis {agg['analysis_s']:.2f}s, max {agg['max_s']:.2f}s"
+            )
+        if self.profile is not None:
+            logger.info(f"   📸 cProfile: {self.snapshots} snapshots in {self.snapshot_dir}")
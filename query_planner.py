@@ -0,0 +1,126 @@
+import time
+import logging
+
+logger = logging.getLogger("VPNScout")
+
+# --- QUERY PLANNER ---
+# Статистика выхлопа по каждому дорку между запусками: сколько новых URL
+# дал поиск, сколько из них (и их потомков) оказались чистыми источниками
+# и сколько нод принесли. По ней планировщик решает порядок запросов,
+# глубину пагинации и какие дорки временно пропускать.
+
+# Вес чистого источника и ноды в оценке выхлопа одного запроса к API
+CLEAN_WEIGHT = 1.0
+NODE_WEIGHT = 0.01
+NEW_URL_WEIGHT = 0.05
+# Сглаживание оценки между запусками
+YIELD_DECAY = 0.5
+
+# Продуктивные дорки листаем глубже
+HIGH_YIELD = 0.5
+MAX_PAGES = 3
+# После стольких пустых запусков подряд дорк начинает пропускаться
+DEAD_AFTER_RUNS = 3
+SKIP_BASE = 6 * 3600
+SKIP_MAX = 7 * 86400
+
+
+class QueryPlanner:
+    def __init__(self, state, queries):
+        self.state = state
+        self.queries = list(dict.fromkeys(queries))
+        self.history = state.load_query_stats() if state is not None else {}
+        self.current = {q: {"requests": 0, "new_urls": 0, "clean_sources": 0, "nodes": 0}
+                        for q in self.queries}
+
+    @staticmethod
+    def tag(query):
+        return f"dork: {query}"
+
+    def query_from_tag(self, source_tag):
+        if source_tag and source_tag.startswith("dork: "):
+            query = source_tag[len("dork: "):]
+            if query in self.current:
+                return query
+        return None
+
+    def yield_of(self, source_tag):
+        """Сглаженный выхлоп дорка, от которого произошёл URL (0 для прочих)."""
+        query = self.query_from_tag(source_tag)
+        past = self.history.get(query) if query is not None else None
+        return past["yield_score"] if past else 0
+
+    def plan(self, now=None):
+        """Список (query, max_pages) в порядке приоритета; мёртвые дорки на паузе пропускаются."""
+        now = now or int(time.time())
+        planned, skipped = [], 0
+        for query in self.queries:
+            past = self.history.get(query)
+            if past and past["skip_until"] > now:
+                skipped += 1
+                continue
+            planned.append(query)
+
+        def priority(query):
+            past = self.history.get(query)
+            # Новые дорки — вперёд (разведка), дальше по выхлопу
+            return (past is not None, -(past["yield_score"] if past else 0))
+
+        planned.sort(key=priority)
+        if skipped:
+            logger.info(f"🧭 [Planner] Skipping {skipped} dead dorks, running {len(planned)}")
+        return [(q, self.max_pages(q)) for q in planned]
+
+    def max_pages(self, query):
+        past = self.history.get(query)
+        if past and past["yield_score"] >= HIGH_YIELD:
+            return MAX_PAGES
+        return 1
+
+    # --- учёт выхлопа текущего запуска ---
+
+    def on_request(self, query):
+        self.current[query]["requests"] += 1
+
+    def on_new_url(self, query):
+        self.current[query]["new_urls"] += 1
+
+    def on_clean(self, source_tag, nodes):
+        query = self.query_from_tag(source_tag)
+        if query is not None:
+            self.current[query]["clean_sources"] += 1
+            self.current[query]["nodes"] += nodes
+
+    def save(self, now=None):
+        if self.state is None:
+            return
+        now = now or int(time.time())
+        for query, run in self.current.items():
+            if run["requests"] == 0:
+                continue
+            past = self.history.get(query) or {
+                "query": query, "runs": 0, "requests": 0, "new_urls": 0, "clean_sources": 0,
+                "nodes": 0, "yield_score": 0.0, "zero_streak": 0, "skip_until": 0, "last_run": 0
+            }
+            run_yield = (
+                run["clean_sources"] * CLEAN_WEIGHT
+                + run["nodes"] * NODE_WEIGHT
+                + run["new_urls"] * NEW_URL_WEIGHT
+            ) / run["requests"]
+            entry = dict(past)
+            entry["runs"] += 1
+            for key in ("requests", "new_urls", "clean_sources", "nodes"):
+                entry[key] += run[key]
+            if past["runs"]:
+                entry["yield_score"] = YIELD_DECAY * past["yield_score"] + (1 - YIELD_DECAY) * run_yield
+            else:
+                entry["yield_score"] = run_yield
+            entry["zero_streak"] = 0 if run["clean_sources"] else past["zero_streak"] + 1
+            entry["skip_until"] = 0
+            if entry["zero_streak"] >= DEAD_AFTER_RUNS:
+                # Экспоненциальная пауза: 6ч, 12ч, 24ч ... до недели
+                backoff = SKIP_BASE * 2 ** (entry["zero_streak"] - DEAD_AFTER_RUNS)
+                entry["skip_until"] = now + min(backoff, SKIP_MAX)
+            entry["last_run"] = now
+            self.state.save_query_stats(entry)
+        self.state.commit()
@@ -4,13 +4,31 @@ import time
 import json
 import logging
 import asyncio
-import aiohttp
 import base64
 import hashlib
-import random
+import argparse
 import urllib.parse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime, timedelta
 
+from crawl_state import CrawlState, STATE_DB_FILE
+from matcher import KeywordMatcher
+from http_client import BodyRejected, HostStats, create_session, read_text_capped
+from vless import parse_vless
+from node_store import NodeStore, NODES_DB_FILE
+from list_writer import ListJournal
+from query_planner import QueryPlanner
+from frontier import Frontier
+from probing import Prober
+from ai_classifier import HFClassifier
+from classifier import MODEL_FILE, load_model
+from metrics import Metrics
+from profiler import PROFILE_ENABLED, Profiler
+from bloom import BloomSet
+from shards import SHARD_DIR, ShardResults, load_deferred, parse_shard, read_seeds, write_seeds
+
 # --- CONFIGURATION & LOGGING ---
 
 logging.basicConfig(
@@ -40,27 +58,34 @@ if _raw_tokens:
 
 HF_TOKEN = os.getenv("HF_TOKEN")
 
-# Headers & API
-HF_API_URL = "https://api-inference.huggingface.co/models/mistralai/Mistral-7B-Instruct-v0.3"
+# Headers & API (HF_API_URL можно подменить локальной заглушкой)
+HF_API_URL = os.getenv(
+    "HF_API_URL", "https://api-inference.huggingface.co/models/mistralai/Mistral-7B-Instruct-v0.3"
+)
 
 # Limits
 CONCURRENCY_LIMIT = 40
 RECURSION_DEPTH = 1
 AI_LIMIT = 3
 MAX_RETRIES = 3
+# Не больше стольких соединений к одному хосту (S3-бакеты, raw.githubusercontent.com)
+HOST_CONNECTION_LIMIT = 8
+# Глобальный бюджет скачиваний за запуск (0 = без лимита)
+FETCH_BUDGET = int(os.getenv("SCOUT_FETCH_BUDGET", "0"))
+
+# CPU-анализ документов в пуле процессов (0 = всё в event loop)
+ANALYSIS_WORKERS = int(os.getenv("SCOUT_ANALYSIS_WORKERS", os.cpu_count() or 1))
+# Мелкие документы дешевле разобрать на месте, чем гонять через IPC
+POOL_MIN_CHARS = 32 * 1024
 
 # GitHub Anti-Ban Settings
-# GitHub Search API ~30 req/min с токеном, ~10 req/min без токена
-GITHUB_SEMAPHORE = asyncio.Semaphore(1)
-GITHUB_DELAY = 3 if GITHUB_TOKENS else 7  # 3s с токеном, 7s без (безопасный режим)
-
-# User Agents
-USER_AGENTS = [
-    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36",
-    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.3 Safari/605.1.15",
-    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36",
-    "Mozilla/5.0 (iPhone; CPU iPhone OS 17_2 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.2 Mobile/15E148 Safari/604.1"
-]
+# GitHub Search API ~30 req/min с токеном, ~10 req/min без токена.
+# Реальный темп берётся из X-RateLimit-Remaining/Reset каждого токена,
+# GITHUB_DELAY — только нижняя граница интервала на токен (вторичные лимиты).
+GITHUB_DELAY = 1 if GITHUB_TOKENS else 6
+# Пауза после вторичного лимита без Retry-After
+GITHUB_SECONDARY_BACKOFF = 60
+
 
 # --- DORKS (FULL MEAT LIST) ---
 SEARCH_QUERIES = [
@@ -278,6 +303,13 @@ S3_DOMAIN_PATTERNS = [
     r'https?://[a-zA-Z0-9.-]*contabo\.com[^\s"<>\)]*',
 ]
 
+# --- PRECOMPILED REGEXES ---
+# Один проход по документу: vless-ссылки и обычные http(s)-ссылки
+LINK_SCAN_REGEX = re.compile(r'(?P<vless>vless://[^\s<>"]+)|(?P<link>https?://[^\s<>"]+)')
+# Все S3-паттерны одной регуляркой (ищем только внутри найденных http-ссылок)
+S3_LINK_REGEX = re.compile("|".join(f"(?:{p})" for p in S3_DOMAIN_PATTERNS))
+MULTILINE_FIX_REGEX = re.compile(r'(\n|\r)\s*(?=[&\?])')
+
 S3_COMMON_FILES = [
     # Основные конфиги
     "configs.txt", "v2ray.txt", "xray.txt", "reality.txt", "vless.txt",
@@ -350,20 +382,71 @@ WHITE_SNI = [
     "ru_target", "russia", ".ru"
 ]
 
+# 6. Заглушки в ссылках
+PLACEHOLDER_STRINGS = ['uuid', 'server', 'your-uuid', 'example.com']
+
+# 7. Precompiled matchers (один проход по тексту на все списки)
+DOC_MATCHER = KeywordMatcher({
+    "bad_domain": BAD_DOMAINS,
+    "ru_marker": ["Russia", "ru_"],
+})
+GUIDE_MATCHER = KeywordMatcher({"guide": GUIDE_KEYWORDS_HARD})  # по content.lower()
+# По полям разобранной ссылки (VlessNode): хост, sni, название
+SNI_MATCHER = KeywordMatcher({
+    "black": BLACK_SNI,
+    "white": WHITE_SNI,
+})
+PLACEHOLDER_MATCHER = KeywordMatcher({"placeholder": PLACEHOLDER_STRINGS})
+S3_MATCHER = KeywordMatcher({"s3": S3_DOMAINS})
+
+# Подсказки в URL. Списки короткие и any() обрывается на первом совпадении,
+# так что автомат здесь только медленнее (замерено на benchmarks/bench_extract.py)
+SUB_HINTS = ('.txt', '.json', '.yaml', 'raw', 'gist')
+HIDDEN_SUB_HINTS = ('/sub?', '/api/', 'download', 'get.php')
+
 # Global Caches & State
-CONTENT_HASHES = set()
-SEEN_FINGERPRINTS = set()
-VISITED_URLS = set()
-RESULTS_BUFFER_RU = []
-RESULTS_BUFFER_POTENTIAL = []
+# Дедупликация — BloomSet (~2.6 байта на элемент вместо строки в set).
+# Ложное «уже видели» для URL и хешей контента — пропуск с вероятностью
+# DEDUP_FP_RATE; отпечатки нод подтверждаются точно (exact=True).
+# SCOUT_DEDUP_FP_RATE=0 — обычные set'ы
+DEDUP_FP_RATE = float(os.getenv("SCOUT_DEDUP_FP_RATE", "0.0001"))
+DEDUP_CAPACITY = 200_000
+
+def dedup_set(exact=False):
+    if DEDUP_FP_RATE <= 0:
+        return set()
+    return BloomSet(DEDUP_CAPACITY, DEDUP_FP_RATE, exact=exact)
+
+CONTENT_HASHES = dedup_set()
+SEEN_FINGERPRINTS = dedup_set(exact=True)
+VISITED_URLS = dedup_set()
+RU_LIST_FILE = "verified_ru.txt"
+POTENTIAL_LIST_FILE = "potential_mixed.txt"
+# Журналы находок: URL пишутся сразу, а не копятся в памяти до конца запуска
+RU_JOURNAL = None
+POTENTIAL_JOURNAL = None
+
+# Persistent state (между запусками) — открывается в main()
+CRAWL_STATE = None
+ANALYSIS_POOL = None
+QUERY_PLANNER = None
+PROBER = None
+AI_CLASSIFIER = None
+LOCAL_MODEL = None
+NODE_STORE = None
+# Профилировщик (SCOUT_PROFILE=1), иначе None
+PROFILER = None
+# Частичный результат шарда (--shard i/N), иначе None
+SHARD = None
 
 # Statistics
 stats = {
     "total_fetched": 0, "errors": 0, "trash": 0, "duplicate": 0,
-    "clean_ru": 0, "clean_global": 0, "aggregators": 0
+    "clean_ru": 0, "clean_global": 0, "aggregators": 0, "cached": 0,
+    "ai_local": 0, "ai_remote": 0
 }
-
-token_status = {}
+# Стадии, задержки, хосты и вердикты — отчёт scout_report.json в конце запуска
+METRICS = Metrics()
 
 # --- HELPER FUNCTIONS ---
 
@@ -371,85 +454,28 @@ def clean_url(url):
     parsed = urllib.parse.urlparse(url)
     return f"{parsed.scheme}://{parsed.netloc}{parsed.path}"
 
-def get_random_header():
-    return {"User-Agent": random.choice(USER_AGENTS)}
-
-def get_best_github_header():
-    """
-    Возвращает кортеж (headers, token) если есть доступный токен.
-    Возвращает (None, wait_time) если ВСЕ токены в бане.
-    """
-    if not GITHUB_TOKENS:
-        return {}, None
-
-    current_time = int(time.time())
-    best_token = None
-    min_reset_time = float('inf')
-
-    for token in GITHUB_TOKENS:
-        # Инициализация токена
-        if token not in token_status:
-            token_status[token] = {'reset_time': 0}
-
-        # Если токен жив — берем его сразу
-        if current_time >= token_status[token]['reset_time']:
-            headers = {
-                "Authorization": f"token {token}",
-                "Accept": "application/vnd.github.v3+json"
-            }
-            return headers, token
-        
-        # Иначе запоминаем, когда он освободится
-        if token_status[token]['reset_time'] < min_reset_time:
-            min_reset_time = token_status[token]['reset_time']
-            best_token = token
-
-    # Если мы тут — живых токенов нет. Считаем сколько ждать.
-    wait_time = max(1, min_reset_time - current_time)
-    return None, wait_time
-
 def get_md5_head(content):
     head = content[:500].encode('utf-8', errors='ignore')
     return hashlib.md5(head).hexdigest()
 
-def extract_vless_fingerprint(vless_link):
-    try:
-        pattern = r'vless://(?P<uuid>[a-zA-Z0-9\-]+)@.*?(?:\?|&)(?:pbk|publickey)=(?P<pbk>[a-zA-Z0-9%\-\_]+)'
-        match = re.search(pattern, vless_link, re.IGNORECASE)
-        if match:
-            return f"{match.group('uuid')}:{match.group('pbk')}"
-        
-        match_simple = re.search(r'vless://(?P<uuid>[a-zA-Z0-9\-]+)@(?P<host>[^:]+)', vless_link)
-        if match_simple:
-            return f"{match_simple.group('uuid')}:{match_simple.group('host')}"
-    except:
-        pass
-    return None
-
-def generate_variations(url):
-    variations = set()
-    # Numeric
-    match = re.search(r'(\d+)\.(txt|json|yaml|conf|sub)$', url)
-    if match:
-        base_num = int(match.group(1))
-        ext = match.group(2)
-        prefix = url[:match.start(1)]
-        start, end = 1, 50
-        if base_num > 50:
-            end = base_num + 10
-        for i in range(start, end + 1):
-            if i == base_num:
-                continue
-            variations.add(f"{prefix}{i}.{ext}")
-            
-    # S3 Brute
-    if any(d in url for d in S3_DOMAINS):
-        parts = url.split('/')
-        if len(parts) > 3:
-            base_path = "/".join(parts[:-1])
-            for filename in S3_COMMON_FILES:
-                variations.add(f"{base_path}/{filename}")
-    return list(variations)
+def extract_links(content):
+    """
+    Один проход по документу. Возвращает (links, s3_links, vless_links) —
+    без дублей, в порядке появления в тексте.
+    """
+    links, s3_links, vless_links = {}, {}, {}
+    for match in LINK_SCAN_REGEX.finditer(content):
+        vless = match.group('vless')
+        if vless is not None:
+            vless_links[vless] = None
+            continue
+        link = match.group('link')
+        if link in links:
+            continue
+        links[link] = None
+        for s3_match in S3_LINK_REGEX.finditer(link):
+            s3_links[s3_match.group()] = None
+    return list(links), list(s3_links), list(vless_links)
 
 def convert_to_raw(url):
     if "raw.githubusercontent.com" in url or "gist.githubusercontent.com" in url:
@@ -462,172 +488,324 @@ def convert_to_raw(url):
 
 # --- SEARCH ENGINES ---
 
-async def search_github_safe(session):
+# Ресурс лимитов /search/code, как его присылает GitHub в X-RateLimit-Resource
+CODE_SEARCH = "code_search"
+
+class GitHubTokenPool:
+    """
+    Планировщик запросов к GitHub API по всем токенам сразу.
+    На каждый токен — один запрос в полёте. Бюджет (remaining/reset) ведётся
+    отдельно для каждого ресурса API — ключ как в X-RateLimit-Resource
+    ("code_search" для /search/code, "core"), и запросы по токену
+    разносятся ровно настолько, чтобы остаток бюджета дожил до reset.
+    """
+
+    def __init__(self, tokens):
+        self.slots = [
+            {"token": t, "busy": False, "next_at": 0.0, "budgets": {}, "used": 0}
+            for t in (tokens or [None])
+        ]
+        self.changed = asyncio.Condition()
+
+    def __len__(self):
+        return len(self.slots)
+
+    @staticmethod
+    def headers(slot):
+        if slot["token"] is None:
+            return {}
+        return {
+            "Authorization": f"token {slot['token']}",
+            "Accept": "application/vnd.github.v3+json"
+        }
+
+    def _ready_at(self, slot, resource, now):
+        ready_at = slot["next_at"]
+        budget = slot["budgets"].get(resource)
+        if budget and budget["remaining"] <= 0 and budget["reset"] > now:
+            ready_at = max(ready_at, budget["reset"] + 1)
+        return ready_at
+
+    async def acquire(self, resource=CODE_SEARCH):
+        """Ждёт свободный токен с бюджетом и возвращает его слот."""
+        async with self.changed:
+            while True:
+                now = time.time()
+                free = [s for s in self.slots if not s["busy"]]
+                if free:
+                    slot = min(free, key=lambda s: self._ready_at(s, resource, now))
+                    ready_at = self._ready_at(slot, resource, now)
+                    if ready_at <= now:
+                        slot["busy"] = True
+                        slot["used"] += 1
+                        return slot
+                    timeout = ready_at - now
+                else:
+                    timeout = None
+                try:
+                    await asyncio.wait_for(self.changed.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def release(self, slot, resp=None, resource=CODE_SEARCH):
+        """Обновляет бюджет токена по заголовкам ответа и отпускает его."""
+        now = time.time()
+        spacing = GITHUB_DELAY
+        if resp is not None:
+            h = resp.headers
+            remaining, reset = h.get("X-RateLimit-Remaining"), h.get("X-RateLimit-Reset")
+            if remaining is not None and reset is not None:
+                budget = {"remaining": int(remaining), "reset": int(reset)}
+                slot["budgets"][h.get("X-RateLimit-Resource", resource)] = budget
+                # Растягиваем остаток бюджета до reset
+                window = max(0, budget["reset"] - now)
+                spacing = max(GITHUB_DELAY, window / max(budget["remaining"], 1))
+            if resp.status in (403, 429):
+                retry_after = h.get("Retry-After")
+                if retry_after and retry_after.isdigit():
+                    spacing = max(spacing, int(retry_after))
+                elif remaining not in (None, "0"):
+                    # Вторичный лимит: бюджет есть, но GitHub просит притормозить
+                    spacing = max(spacing, GITHUB_SECONDARY_BACKOFF)
+        slot["next_at"] = now + spacing
+        async with self.changed:
+            slot["busy"] = False
+            self.changed.notify_all()
+
+    def log_summary(self):
+        for slot in self.slots:
+            name = f"...{slot['token'][-4:]}" if slot["token"] else "anon"
+            budget = slot["budgets"].get(CODE_SEARCH)
+            left = budget["remaining"] if budget else "?"
+            logger.info(f"   🔑 {name}: {slot['used']} req, search budget left: {left}")
+
+async def search_query(session, pool, query, found, max_pages=1):
+    page = 1
+    attempts = 0
+    tag = QueryPlanner.tag(query)
+    while page <= max_pages and attempts < MAX_RETRIES:
+        encoded_query = urllib.parse.quote(query)
+        url = (
+            f"https://api.github.com/search/code?q={encoded_query}"
+            f"&sort=indexed&order=desc&per_page=30&page={page}"
+        )
+
+        slot = await pool.acquire(CODE_SEARCH)
+        if QUERY_PLANNER is not None:
+            QUERY_PLANNER.on_request(query)
+        resp = None
+        started = time.perf_counter()
+        try:
+            async with session.get(url, headers=pool.headers(slot), timeout=15) as resp:
+                METRICS.inc("search_requests_total", status=resp.status)
+                if resp.status == 200:
+                    data = await resp.json()
+                    items = data.get("items", [])
+                    for item in items:
+                        raw_url = convert_to_raw(item['html_url'])
+                        if (raw_url, tag) in found:
+                            continue
+                        found.add((raw_url, tag))
+                        if QUERY_PLANNER is not None and not (
+                            CRAWL_STATE is not None and CRAWL_STATE.get(clean_url(raw_url))
+                        ):
+                            QUERY_PLANNER.on_new_url(query)
+
+                    if items:
+                        token_display = slot["token"][-4:] if slot["token"] else "anon"
+                        logger.info(f"   ✅ [...{token_display}] '{query[:25]}' p{page}: +{len(items)}")
+                    page += 1
+                    # Неполная страница — дальше листать нечего
+                    if len(items) < 30:
+                        break
+
+                elif resp.status in (403, 429):
+                    # Токен упёрся в лимит — пул сам отложит его до reset,
+                    # запрос повторится на другом токене
+                    attempts += 1
+                    token_display = slot["token"][-4:] if slot["token"] else "anon"
+                    logger.warning(f"🚫 Rate limit [...{token_display}] на '{query[:25]}'. Повтор...")
+                else:
+                    # Другие ошибки (422, 404 и т.д.)
+                    break
+        except Exception as e:
+            METRICS.inc("search_requests_total", status="error")
+            logger.error(f"Request error: {e}")
+            # При ошибке сети прерываем этот запрос
+            break
+        finally:
+            METRICS.stage("search", time.perf_counter() - started)
+            await pool.release(slot, resp, CODE_SEARCH)
+
+async def search_github_safe(session, pool):
     found = set()
     mode = "Token" if GITHUB_TOKENS else "Public"
-    logger.info(f"🔍 [GitHub] {mode} Mode: 1 req/{GITHUB_DELAY}s. Tokens: {len(GITHUB_TOKENS)}")
-    
-    for query in SEARCH_QUERIES:
-        page = 1
-        while page <= 1:
-            # 1. Получаем токен
-            headers, result = get_best_github_header()
-
-            # Если вернулся None — значит ВСЕ токены в бане
-            if headers is None:
-                wait_time = result
-                logger.warning(f"🛑 Все токены в бане. Ждем {int(wait_time)} сек...")
-                await asyncio.sleep(wait_time + 5)
-                continue # Пробуем снова достать токен
-
-            token_used = result
-            
-            encoded_query = urllib.parse.quote(query)
-            url = (
-                f"https://api.github.com/search/code?q={encoded_query}"
-                f"&sort=indexed&order=desc&per_page=30&page={page}"
-            )
-            
-            try:
-                # 2. Глобальная блокировка (Semaphore) + Задержка
-                async with GITHUB_SEMAPHORE:
-                    await asyncio.sleep(GITHUB_DELAY)
-                    async with session.get(url, headers=headers, timeout=15) as resp:
-                        
-                        if resp.status == 200:
-                            data = await resp.json()
-                            items = data.get("items", [])
-                            for item in items:
-                                found.add((convert_to_raw(item['html_url']), f"dork: {query[:20]}..."))
-                            
-                            if items:
-                                token_display = token_used[-4:] if token_used else "anon"
-                                logger.info(f"   ✅ [...{token_display}] '{query[:25]}': +{len(items)}")
-                            
-                            page += 1
-                            # Semaphore отпустится сам
-
-                        elif resp.status == 403 or resp.status == 429:
-                            reset_time = resp.headers.get("X-RateLimit-Reset")
-                            wait_time = 3600 # Дефолт час
-                            if reset_time:
-                                wait_time = max(10, int(reset_time) - int(time.time()))
-                            
-                            # Ставим токен в бан (только если токен был)
-                            if token_used:
-                                token_status[token_used] = {'reset_time': int(time.time()) + wait_time}
-                                logger.warning(f"🚫 Токен ...{token_used[-4:]} в бане на {int(wait_time/60)} мин. Смена...")
-                            else:
-                                # Без токена — ждём перед повтором (GitHub даёт ~10 req/min публично)
-                                wait_time = 70  # Ждём чуть больше минуты
-                                logger.warning(f"🚫 Rate limit (без токена). Ждём {wait_time} сек...")
-                                await asyncio.sleep(wait_time)
-                            
-                            # НЕ выходим (семафор уже отпущен).
-                            # Цикл перезапустится и возьмет другой токен.
-                            continue
-                        else:
-                            # Другие ошибки (422, 404 и т.д.)
-                            break
-
-            except Exception as e:
-                logger.error(f"Request error: {e}")
-                # При ошибке сети прерываем этот запрос
-                break
-                
+    logger.info(f"🔍 [GitHub] {mode} Mode: {len(pool)} parallel, adaptive rate. Tokens: {len(GITHUB_TOKENS)}")
+
+    queries = asyncio.Queue()
+    if QUERY_PLANNER is not None:
+        plan = QUERY_PLANNER.plan()
+    else:
+        plan = [(query, 1) for query in SEARCH_QUERIES]
+    for item in plan:
+        queries.put_nowait(item)
+
+    async def search_worker():
+        while not queries.empty():
+            query, max_pages = queries.get_nowait()
+            await search_query(session, pool, query, found, max_pages)
+
+    # По одному исполнителю на токен: токены работают параллельно
+    await asyncio.gather(*(search_worker() for _ in range(len(pool))))
+    pool.log_summary()
     return list(found)
 
-async def search_gists(session):
+async def search_gists(session, pool):
     found = set()
     logger.info("🔍 [Gist] Сканирование ленты...")
-    # Гисты тоже редко, но банят. Используем тот же семафор для безопасности.
-    async with GITHUB_SEMAPHORE:
-        await asyncio.sleep(GITHUB_DELAY)
-        try:
-            url = "https://api.github.com/gists/public?per_page=60"
-            # Берем любой токен, если есть, иначе без него
-            headers, _ = get_best_github_header()
-            if headers is None: 
-                headers = {} # Если токенов нет совсем
-
-            async with session.get(url, headers=headers, timeout=15) as resp:
-                if resp.status == 200:
-                    gists = await resp.json()
-                    keywords = ["vless", "reality", "sub", "free", "nodes", "v2ray", "whitelist", "bypass"]
-                    for gist in gists:
-                        files = gist.get("files", {})
-                        desc = (gist.get("description") or "").lower()
-                        if any(k in desc for k in keywords) or any(k in str(files).lower() for k in keywords):
-                            for fname, fcal in files.items():
-                                if fcal.get("raw_url"):
-                                    found.add((fcal["raw_url"], "source: gist"))
-        except Exception:
-            pass
-    return list(found)
-
-# --- AI ANALYSIS ---
-
-async def ask_huggingface_async(session, snippet):
-    if not HF_TOKEN:
-        return "unknown", "No Token"
-    
-    prompt = f"""Analyze this text. Is it a 'Guide/Tutorial', 'Spam', 'RU VPN Config', or 'Global VPN Config'?
-Look for Russian SNI (gosuslugi, yandex, etc) or Russian text.
-If it contains donation links but has configs, it is a Config, not spam.
-Format: "Verdict: [RU/Global/Spam/Guide] Reason: [reason]"
-Snippet: {snippet[:700]}"""
-    
+    # Гисты тоже редко, но банят. Идём через тот же пул токенов (бюджет "core").
+    slot = await pool.acquire("core")
+    resp = None
+    started = time.perf_counter()
     try:
-        headers = {"Authorization": f"Bearer {HF_TOKEN}"}
-        payload = {
-            "inputs": prompt,
-            "parameters": {"max_new_tokens": 25, "return_full_text": False}
-        }
-        
-        async with session.post(HF_API_URL, headers=headers, json=payload, timeout=8) as resp:
+        url = "https://api.github.com/gists/public?per_page=60"
+        async with session.get(url, headers=pool.headers(slot), timeout=15) as resp:
             if resp.status == 200:
-                res = await resp.json()
-                text = res[0]['generated_text'].lower() if isinstance(res, list) else ""
-                
-                if "guide" in text or "tutorial" in text:
-                    return "guide", "AI detected guide"
-                if "spam" in text:
-                    return "spam", "AI detected spam"
-                if "ru" in text:
-                    return "ru", "AI detected RU context"
-                if "global" in text:
-                    return "global", "AI says Global"
-                
-                return "unknown", text
-    except:
+                gists = await resp.json()
+                keywords = ["vless", "reality", "sub", "free", "nodes", "v2ray", "whitelist", "bypass"]
+                for gist in gists:
+                    files = gist.get("files", {})
+                    desc = (gist.get("description") or "").lower()
+                    if any(k in desc for k in keywords) or any(k in str(files).lower() for k in keywords):
+                        for fname, fcal in files.items():
+                            if fcal.get("raw_url"):
+                                found.add((fcal["raw_url"], "source: gist"))
+    except Exception:
         pass
-    return "unknown", "Error"
+    finally:
+        METRICS.stage("search", time.perf_counter() - started)
+        await pool.release(slot, resp, "core")
+    return list(found)
+
+# --- AI ANALYSIS ---
 
 # --- CORE LOGIC ---
 
-async def fetch_and_analyze(session, url, depth, ai_semaphore):
+def is_fresh_in_state(url_clean):
+    return CRAWL_STATE is not None and CRAWL_STATE.is_fresh(url_clean)
+
+def seed_fingerprints(url_clean):
+    """
+    Ноды чистого источника, пропущенного без скачивания (свежий / 304), уже учтены:
+    зеркало, скачанное позже в этом запуске, не должно пройти как новые ноды.
+    """
+    fingerprints = CRAWL_STATE.fingerprints_of(url_clean)
+    for fp in fingerprints:
+        SEEN_FINGERPRINTS.add(fp)
+    return fingerprints
+
+async def fetch_and_analyze(session, url, depth):
     url_clean = clean_url(url)
     if url_clean in VISITED_URLS:
         return "duplicate", 0, None
     VISITED_URLS.add(url_clean)
 
+    # 0. Инкрементальный режим: свежие URL не перекачиваем
+    if is_fresh_in_state(url_clean):
+        entry = CRAWL_STATE.get(url_clean)
+        if entry is not None and entry["verdict"] == "clean":
+            seed_fingerprints(url_clean)
+        return "cached", 0, None
+
+    # 0.1 Conditional GET по сохранённым ETag / Last-Modified
+    headers = {}
+    cached = None
+    if CRAWL_STATE is not None:
+        validators, cached = CRAWL_STATE.conditional_headers(url_clean)
+        headers.update(validators)
+
+    host = urllib.parse.urlparse(url_clean).netloc
+    started = time.perf_counter()
+    fetch_status = "error"
+    content = None
     try:
-        headers = get_random_header()
         async with session.get(url, headers=headers, timeout=10) as resp:
+            fetch_status = resp.status
+            if resp.status == 304 and cached is not None:
+                CRAWL_STATE.touch(url_clean)
+                # Контент не менялся — берём прошлый вердикт без скачивания
+                if cached["verdict"] == "clean":
+                    fingerprints = seed_fingerprints(url_clean)
+                    if NODE_STORE is not None:
+                        NODE_STORE.touch_source(url_clean)
+                    if SHARD is not None:
+                        SHARD.add_clean(url, cached["tag"], fingerprints)
+                    return "clean", cached["node_count"], (cached["tag"], [])
+                return "cached", 0, None
             if resp.status != 200:
+                record_state(url_clean, "dead")
                 return "dead", 0, None
-            content = await resp.text(errors='ignore')
+            etag = resp.headers.get("ETag")
+            last_modified = resp.headers.get("Last-Modified")
+            content = await read_text_capped(resp, reject_arabic=True)
+    except BodyRejected as e:
+        fetch_status = "rejected"
+        record_state(url_clean, "trash")
+        return "trash", 0, e.reason
+    except asyncio.TimeoutError:
+        fetch_status = "timeout"
+        record_state(url_clean, "error")
+        return "error", 0, None
     except:
+        record_state(url_clean, "error")
         return "error", 0, None
+    finally:
+        elapsed = time.perf_counter() - started
+        METRICS.stage("fetch", elapsed)
+        METRICS.inc("host_requests_total", host=host, status=fetch_status)
+        METRICS.inc("host_fetch_seconds_total", elapsed, host=host)
+        # Таймауты, ошибки, 304 и не-200 — тоже в топы: медленная сеть видна именно там
+        if PROFILER is not None and content is None:
+            PROFILER.record(url_clean, host, elapsed, elapsed, 0, outcome=fetch_status)
 
     # 1. Dedup
     content_hash = get_md5_head(content)
     if content_hash in CONTENT_HASHES:
+        record_state(url_clean, "duplicate", content_hash=content_hash)
         return "duplicate", 0, None
     CONTENT_HASHES.add(content_hash)
 
+    fingerprints = []
+    status, count, data = await analyze_content(content, url_clean, depth, fingerprints)
+    tag = data[0] if status == "clean" else None
+    record_state(url_clean, status, count, content_hash, tag, fingerprints, etag, last_modified)
+    if SHARD is not None and status == "clean":
+        SHARD.add_clean(url, tag, fingerprints)
+    if PROFILER is not None:
+        PROFILER.record(url_clean, host, elapsed, time.perf_counter() - started, len(content), outcome=status)
+    return status, count, data
+
+def record_state(url_clean, verdict, node_count=0, content_hash=None, tag=None, fingerprints=(),
+                 etag=None, last_modified=None):
+    if CRAWL_STATE is not None:
+        CRAWL_STATE.record(url_clean, verdict, node_count, content_hash, tag, fingerprints,
+                           etag, last_modified)
+
+def analyze_document(content, url_clean, depth, timings=None):
+    """
+    Чистый разбор документа: без I/O и без общего состояния, поэтому
+    выполняется в пуле процессов. Возвращает (status, data):
+      ("trash", reason), ("aggregator", subs) или
+      ("candidate", {"nodes": [(VlessNode, is_white, link), ...], "ru_marker", "snippet", "links"}),
+    где links — [(url, kind), ...] для приоритетов фронтира.
+    В timings (если передан) складывается время стадий decode/extract/classify.
+    """
+    if timings is None:
+        timings = {}
+    started = time.perf_counter()
+
     # 2. Multiline fix
-    content = re.sub(r'(\n|\r)\s*(?=[&\?])', '', content)
+    content = MULTILINE_FIX_REGEX.sub('', content)
 
     # 3. Base64
     if "vless://" not in content and len(content) > 50:
@@ -637,63 +815,143 @@ async def fetch_and_analyze(session, url, depth, ai_semaphore):
                 content = decoded
         except:
             pass
+    started = _lap(timings, "decode", started)
 
     # 4. Hard Block (Arabic/Iran)
     if ARABIC_REGEX.search(content):
-        return "trash", 0, "Arabic"
-    if any(d in content for d in BAD_DOMAINS):
-        return "trash", 0, "Bad Domain"
+        _lap(timings, "extract", started)
+        return "trash", "Arabic"
+    doc_hits = DOC_MATCHER.scan(content)
+    if "bad_domain" in doc_hits:
+        _lap(timings, "extract", started)
+        return "trash", "Bad Domain"
 
     # 5. Guide Heuristic
     content_lower = content.lower()
-    hard_guide_hits = sum(1 for word in GUIDE_KEYWORDS_HARD if word in content_lower)
+    hard_guide_hits = len(GUIDE_MATCHER.scan(content_lower).get("guide", ()))
     
     if hard_guide_hits >= 2 and "vless://" not in content and "reality" not in content:
-        return "trash", 0, "Pure Guide"
+        _lap(timings, "extract", started)
+        return "trash", "Pure Guide"
 
     # 6. Matryoshka & S3 Extraction
-    links_raw = re.findall(r'(https?://[^\s<>"]+)', content)
-    subs = [l for l in links_raw if any(x in l for x in ['.txt', '.json', '.yaml', 'raw', 'gist'])]
+    links_raw, s3_links, vless_links = extract_links(content)
+    subs = [l for l in links_raw if any(x in l for x in SUB_HINTS)]
     
     # NEW: Extract S3 links from text
-    for pattern in S3_DOMAIN_PATTERNS:
-        s3_matches = re.findall(pattern, content)
-        for s3_url in s3_matches:
-            if s3_url not in subs:
-                subs.append(s3_url)
+    sub_set = set(subs)
+    for s3_url in s3_links:
+        if s3_url not in sub_set:
+            subs.append(s3_url)
 
+    started = _lap(timings, "extract", started)
     if len(subs) >= 3 and "vless://" not in content:
         if depth < RECURSION_DEPTH:
-            return "aggregator", 0, subs
-        return "trash", 0, "Max recursion"
+            return "aggregator", subs
+        return "trash", "Max recursion"
 
-    # 7. VLESS Parsing
-    vless_links = re.findall(r'vless://[^\s<>"]+', content)
-    valid_count = 0
-    white_hits = 0
+    # 7. VLESS Parsing (дедупликация по SEEN_FINGERPRINTS — уже в event loop)
+    nodes = []
     
     for link in vless_links:
-        if "security=reality" not in link and "type=grpc" not in link:
+        node = parse_vless(link)
+        if node is None:
             continue
-        if any(b in link for b in BLACK_SNI):
+        if node.security != "reality" and node.type != "grpc":
             continue
-        if any(p in link for p in ['uuid', 'server', 'your-uuid', 'example.com']):
+        hits = SNI_MATCHER.scan(node.match_text())
+        if "black" in hits:
             continue
-            
-        uuid_match = re.search(r'(?P<uuid>[a-f0-9\-]{32,36})@', link, re.I)
-        if uuid_match:
-            uuid = uuid_match.group('uuid').replace('-', '')
-            if len(uuid) != 32:
-                continue 
-            if len(set(uuid)) < 5:
-                continue 
-        
-        if any(w in link for w in WHITE_SNI):
+        if PLACEHOLDER_MATCHER.scan(f"{node.uuid} {node.host} {node.sni}"):
+            continue
+        if not node.valid_uuid():
+            continue
+
+        nodes.append((node, "white" in hits, link))
+
+    _lap(timings, "classify", started)
+    if not nodes:
+        return "trash", "No valid VLESS"
+
+    hidden_subs = []
+    for link in links_raw:
+        if any(x in link for x in HIDDEN_SUB_HINTS):
+            hidden_subs.append(link)
+
+    return "candidate", {
+        "nodes": nodes,
+        "ru_marker": "ru_marker" in doc_hits,
+        "snippet": content[:700],
+        "links": (
+            [(u, "hidden") for u in hidden_subs]
+            + [(u, "sub") for u in subs]
+        ),
+    }
+
+def _lap(timings, stage, started):
+    now = time.perf_counter()
+    timings[stage] = timings.get(stage, 0.0) + now - started
+    return now
+
+def analyze_document_timed(content, url_clean, depth):
+    """analyze_document для пула: время стадий возвращается вместе с результатом."""
+    timings = {}
+    return analyze_document(content, url_clean, depth, timings), timings
+
+async def run_analysis(content, url_clean, depth):
+    result = None
+    if ANALYSIS_POOL is not None and len(content) >= POOL_MIN_CHARS:
+        loop = asyncio.get_running_loop()
+        try:
+            result, timings = await loop.run_in_executor(
+                ANALYSIS_POOL, analyze_document_timed, content, url_clean, depth
+            )
+        except BrokenProcessPool:
+            logger.warning("⚠️ Analysis pool is broken, analysing inline")
+    if result is None:
+        if PROFILER is not None:
+            with PROFILER.analysis():
+                result, timings = analyze_document_timed(content, url_clean, depth)
+        else:
+            result, timings = analyze_document_timed(content, url_clean, depth)
+    for stage, seconds in timings.items():
+        METRICS.stage(stage, seconds)
+    return result
+
+async def classify_snippet(snippet):
+    """Локальная модель, а удалённая — только если локальная не уверена."""
+    if LOCAL_MODEL is not None:
+        with METRICS.timer("classify"):
+            label, confidence = LOCAL_MODEL.predict(snippet)
+        if LOCAL_MODEL.confident(confidence):
+            stats["ai_local"] += 1
+            METRICS.inc("ai_verdicts_total", source="local", verdict=label)
+            return label, f"Local model ({confidence:.2f})"
+    stats["ai_remote"] += 1
+    with METRICS.timer("ai"):
+        verdict, reason = await AI_CLASSIFIER.classify(snippet)
+    METRICS.inc("ai_verdicts_total", source="remote", verdict=verdict)
+    return verdict, reason
+
+async def analyze_content(content, url_clean, depth, fingerprints):
+    """Разбор скачанного контента. Новые отпечатки нод складываются в fingerprints."""
+    started = time.perf_counter()
+    status, data = await run_analysis(content, url_clean, depth)
+    if PROFILER is not None:
+        PROFILER.note(url_clean, "analysis", time.perf_counter() - started)
+    if status != "candidate":
+        return status, 0, data
+
+    # Слияние с общим состоянием дедупликации
+    valid_count = 0
+    white_hits = 0
+    for node, is_white, _ in data["nodes"]:
+        if is_white:
             white_hits += 1
-        
-        fp = extract_vless_fingerprint(link)
-        if fp and fp not in SEEN_FINGERPRINTS:
+        fp = node.fingerprint()
+        if fp not in SEEN_FINGERPRINTS:
             SEEN_FINGERPRINTS.add(fp)
+            fingerprints.append(fp)
             valid_count += 1
 
     if valid_count == 0:
@@ -701,137 +959,291 @@ async def fetch_and_analyze(session, url, depth, ai_semaphore):
 
     # 8. Classification
     is_ru = False
-    if white_hits > 0 or "Russia" in content or "ru_" in content:
+    if white_hits > 0 or data["ru_marker"]:
         is_ru = True
     
     # AI Check
     verdict = "unknown"
     if not is_ru:
-        async with ai_semaphore:
-            verdict, reason = await ask_huggingface_async(session, content)
-            if verdict == "ru":
-                is_ru = True
-            elif verdict == "guide":
-                return "trash", 0, "AI-Guide"
-            elif verdict == "spam":
-                return "trash", 0, "AI-Spam"
+        started = time.perf_counter()
+        verdict, reason = await classify_snippet(data["snippet"])
+        if PROFILER is not None:
+            PROFILER.note(url_clean, "ai", time.perf_counter() - started)
+        if verdict == "ru":
+            is_ru = True
+        elif verdict == "guide":
+            return "trash", 0, "AI-Guide"
+        elif verdict == "spam":
+            return "trash", 0, "AI-Spam"
 
     tag = "RU" if is_ru else "GLOBAL"
+    if NODE_STORE is not None:
+        with METRICS.timer("save"):
+            for node, _, link in data["nodes"]:
+                NODE_STORE.upsert(node, link, url_clean, tag)
     
-    # Variations
-    variations = generate_variations(url_clean)
-    hidden_subs = []
-    if valid_count > 0:
-        for link in links_raw:
-            if any(x in link for x in ['/sub?', '/api/', 'download', 'get.php']):
-                hidden_subs.append(link)
-    
-    return "clean", valid_count, (tag, variations + hidden_subs + subs)
+    return "clean", valid_count, (tag, data["links"])
 
 # --- WORKER ---
 
-async def worker(queue, session, ai_sem):
+async def enqueue(queue, item, kind):
+    """В очередь — только URL своего шарда, чужие откладываются до следующего запуска."""
+    if SHARD is not None and not SHARD.owns(item[0]):
+        SHARD.defer(item, kind)
+        return
+    await queue.put(item, kind)
+
+async def enqueue_probes(queue, items):
+    """Догадки Prober'а во фронтир. Уже известные URL сразу засчитываются как нейтральный результат."""
+    while items:
+        v_url, source_tag, depth = items.pop()
+        if v_url in VISITED_URLS or is_fresh_in_state(v_url):
+            items.extend(PROBER.on_result(v_url, "cached"))
+            continue
+        await enqueue(queue, (v_url, source_tag, depth), "variation")
+
+async def worker(queue, session):
     while True:
         item = await queue.get()
         url, source_tag, depth = item
-        status, count, data = await fetch_and_analyze(session, url, depth, ai_sem)
+        status, count, data = await fetch_and_analyze(session, url, depth)
         stats["total_fetched"] += 1
+        METRICS.inc("verdicts_total", verdict=status)
+        if status == "clean":
+            METRICS.inc("nodes_total", count, tag=data[0])
+        elif status == "trash" and data:
+            METRICS.inc("trash_reasons_total", reason=data)
         
         if status == "clean":
-            tag, variations = data
+            tag, links = data
+            if QUERY_PLANNER is not None:
+                QUERY_PLANNER.on_clean(source_tag, count)
+            # В режиме шарда находки пишет SHARD (вместе с отпечатками нод)
             if tag == "RU":
-                RESULTS_BUFFER_RU.append(url)
+                if RU_JOURNAL is not None:
+                    RU_JOURNAL.add(url)
                 stats["clean_ru"] += count
                 logger.info(f"✅ [RU] Found {count} nodes: {url}")
             else:
-                RESULTS_BUFFER_POTENTIAL.append(url)
+                if POTENTIAL_JOURNAL is not None:
+                    POTENTIAL_JOURNAL.add(url)
                 stats["clean_global"] += count
                 logger.info(f"⚠️ [POTENTIAL] Found {count} nodes: {url}")
 
-            if variations:
-                for v_url in variations:
-                    if clean_url(v_url) not in VISITED_URLS:
-                        await queue.put((v_url, "source: recursion", depth))
+            for v_url, kind in links:
+                v_clean = clean_url(v_url)
+                if v_clean not in VISITED_URLS and not is_fresh_in_state(v_clean):
+                    # Потомки наследуют тег корня — выхлоп засчитывается дорку
+                    await enqueue(queue, (v_url, source_tag, depth), kind)
+            if PROBER is not None:
+                await enqueue_probes(queue, PROBER.expand(clean_url(url), source_tag, depth))
                             
         elif status == "aggregator":
             stats["aggregators"] += 1
             for sub_url in data:
-                if clean_url(sub_url) not in VISITED_URLS:
-                    await queue.put((sub_url, "source: recursion", depth + 1))
+                sub_clean = clean_url(sub_url)
+                if sub_clean not in VISITED_URLS and not is_fresh_in_state(sub_clean):
+                    await enqueue(queue, (sub_url, source_tag, depth + 1), "aggregator")
                     
         elif status == "trash":
             stats["trash"] += 1
         elif status == "error":
             stats["errors"] += 1
+        elif status == "cached":
+            stats["cached"] += 1
+
+        # Результат угаданного URL двигает его последовательность перебора
+        if PROBER is not None:
+            await enqueue_probes(queue, PROBER.on_result(clean_url(url), status))
             
-        queue.task_done()
+        queue.record_result(url, status)
+        await queue.task_done(item)
 
-# --- SMART MERGE ---
+# --- SAVE ---
 
-def smart_merge_and_save(filename, new_urls):
-    existing = set()
-    if os.path.exists(filename):
-        with open(filename, "r", encoding="utf-8") as f:
-            for line in f:
-                if line.strip():
-                    existing.add(line.strip())
-                    
-    initial_count = len(existing)
-    for url in new_urls:
-        existing.add(url)
-    added_count = len(existing) - initial_count
-    
-    with open(filename, "w", encoding="utf-8") as f:
-        for url in sorted(list(existing)):
-            f.write(url + "\n")
-            
-    return added_count, len(existing)
+async def save_results():
+    """Сливает журналы находок со списками (потоково, с атомарной подменой файла)."""
+    if RU_JOURNAL is None:
+        return
+    with METRICS.timer("save"):
+        result = await RU_JOURNAL.finish()
+        if result is not None:
+            logger.info(f"🔥 [RU] Saved {result[0]} new sources. Total: {result[1]}")
+
+        result = await POTENTIAL_JOURNAL.finish()
+        if result is not None:
+            logger.info(f"🗂️ [MIXED] Saved {result[0]} unverified sources. Total: {result[1]}")
 
 # --- MAIN ---
 
-async def main():
-    # Детальный лог токенов
-    if GITHUB_TOKENS:
-        logger.info(f"🔑 Найдено токенов: {len(GITHUB_TOKENS)}")
-        for i, t in enumerate(GITHUB_TOKENS, 1):
-            logger.info(f"   Token #{i}: ...{t[-6:]} (len={len(t)})")
-    else:
-        logger.warning("⚠️ Токены не найдены! Работаем без авторизации (медленно)")
-        logger.info(f"   GTA_TOKEN raw length: {len(os.getenv('GTA_TOKEN', ''))}")
-        logger.info(f"   GITHUB_TOKEN raw length: {len(os.getenv('GITHUB_TOKEN', ''))}")
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="VPN Scout: поиск и обход источников vless")
+    parser.add_argument("--harvest-only", action="store_true",
+                        help="только поиск: затравка фронтира пишется в --seeds")
+    parser.add_argument("--seeds", help="файл затравки (пишет --harvest-only, читает обход)")
+    parser.add_argument("--shard", type=parse_shard, help="i/N: обходить только свой раздел хостов")
+    parser.add_argument("--out-dir", default=SHARD_DIR, help="куда шард пишет частичный результат")
+    args = parser.parse_args(argv)
+    if (args.harvest_only or args.shard) and not args.seeds:
+        parser.error("--harvest-only and --shard need --seeds")
+    return args
+
+def planner_counts():
+    """Ненулевой выхлоп дорков этого запуска — в режиме шардов его сохраняет merge."""
+    return {q: run for q, run in QUERY_PLANNER.current.items() if any(run.values())}
+
+async def main(argv=None):
+    global CRAWL_STATE, ANALYSIS_POOL, QUERY_PLANNER, PROBER, LOCAL_MODEL, NODE_STORE, PROFILER, SHARD
+    args = parse_args(argv)
+    state_path, nodes_path = STATE_DB_FILE, NODES_DB_FILE
+    if args.shard:
+        SHARD = ShardResults(args.out_dir, *args.shard)
+        SHARD.prepare(STATE_DB_FILE, NODES_DB_FILE)
+        state_path, nodes_path = SHARD.state_path, SHARD.nodes_path
+        logger.info(f"🧩 {SHARD.name}: state copy {state_path}")
+    CRAWL_STATE = CrawlState(state_path)
+    NODE_STORE = NodeStore(nodes_path)
+    # Общие базы чистит тот, кто их коммитит: одиночный запуск или shards.py merge
+    if not (args.shard or args.harvest_only):
+        CRAWL_STATE.prune()
+        NODE_STORE.prune()
+    QUERY_PLANNER = QueryPlanner(CRAWL_STATE, SEARCH_QUERIES)
+    LOCAL_MODEL = load_model(MODEL_FILE)
+    if LOCAL_MODEL is not None:
+        logger.info(f"🧮 Local classifier loaded: {sorted(LOCAL_MODEL.docs)}, threshold {LOCAL_MODEL.threshold:.3f}")
+    PROBER = Prober(CRAWL_STATE, is_s3=lambda url: bool(S3_MATCHER.scan(url)), common_files=S3_COMMON_FILES,
+                    owns=SHARD.owns if SHARD is not None else None)
+    if PROFILE_ENABLED:
+        PROFILER = Profiler()
+        PROFILER.start()
+        logger.info("⏱️ Profiling mode on")
+    # cProfile видит только анализ в этом процессе — со снимками пул не поднимаем
+    if ANALYSIS_WORKERS > 0 and not args.harvest_only and not (PROFILER is not None and PROFILER.cprofile):
+        ANALYSIS_POOL = ProcessPoolExecutor(
+            max_workers=ANALYSIS_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+        logger.info(f"🧠 Analysis pool: {ANALYSIS_WORKERS} processes")
+    try:
+        await run_scout(args)
+    finally:
+        if SHARD is not None:
+            SHARD.close(stats, planner_counts())
+        elif not args.harvest_only:
+            QUERY_PLANNER.save()
+        CRAWL_STATE.close()
+        logger.info(f"🗄️ Node store: {NODE_STORE.count()} nodes")
+        NODE_STORE.close()
+        if ANALYSIS_POOL is not None:
+            ANALYSIS_POOL.shutdown(cancel_futures=True)
+        extra = {"stats": stats}
+        if PROFILER is not None:
+            PROFILER.stop()
+            PROFILER.log_summary()
+            extra["profile"] = PROFILER.report()
+        # Отчёт пишется и после таймаута/ошибки — именно такие запуски интереснее всего.
+        # Шарды и harvest пишут свой отчёт рядом с частичным результатом, без истории
+        if SHARD is not None:
+            METRICS.write_report(SHARD.report_path, None, extra)
+        elif args.harvest_only:
+            METRICS.write_report(os.path.join(os.path.dirname(args.seeds) or ".", "harvest.report.json"), None, extra)
+        else:
+            METRICS.write_report(extra=extra)
+        METRICS.write_prometheus()
+
+async def harvest(session):
+    """Поиск по GitHub и гистам плюс URL, отложенные шардами прошлого запуска: [(url, tag, depth, kind)]."""
+    harvest_started = time.perf_counter()
+    token_pool = GitHubTokenPool(GITHUB_TOKENS)
+    gh_results = await search_github_safe(session, token_pool)
+    gist_results = await search_gists(session, token_pool)
+    deferred = load_deferred()
+    METRICS.observe("phase_seconds", time.perf_counter() - harvest_started, phase="harvest")
+    METRICS.inc("seeds_total", len(gh_results), source="github")
+    METRICS.inc("seeds_total", len(gist_results), source="gist")
+    METRICS.inc("seeds_total", len(deferred), source="deferred")
+    return (
+        [(url, tag, 0, "seed") for url, tag in gh_results]
+        + [(url, tag, 0, "gist") for url, tag in gist_results]
+        + deferred
+    )
+
+async def run_scout(args):
+    global AI_CLASSIFIER, RU_JOURNAL, POTENTIAL_JOURNAL
+    crawl_from_file = args.seeds is not None and not args.harvest_only
+    # Детальный лог токенов (обходу из файла затравки они не нужны)
+    if not crawl_from_file:
+        if GITHUB_TOKENS:
+            logger.info(f"🔑 Найдено токенов: {len(GITHUB_TOKENS)}")
+            for i, t in enumerate(GITHUB_TOKENS, 1):
+                logger.info(f"   Token #{i}: ...{t[-6:]} (len={len(t)})")
+        else:
+            logger.warning("⚠️ Токены не найдены! Работаем без авторизации (медленно)")
+            logger.info(f"   GTA_TOKEN raw length: {len(os.getenv('GTA_TOKEN', ''))}")
+            logger.info(f"   GITHUB_TOKEN raw length: {len(os.getenv('GITHUB_TOKEN', ''))}")
     
-    async with aiohttp.ClientSession() as session:
-        queue = asyncio.Queue()
-        ai_sem = asyncio.Semaphore(AI_LIMIT)
+    # Шард пишет находки в свой частичный результат, списки сливает shards.py merge
+    if SHARD is None and not args.harvest_only:
+        RU_JOURNAL = ListJournal(RU_LIST_FILE)
+        POTENTIAL_JOURNAL = ListJournal(POTENTIAL_LIST_FILE)
+        await RU_JOURNAL.start()
+        await POTENTIAL_JOURNAL.start()
+
+    host_stats = HostStats()
+    async with create_session(
+        limit=CONCURRENCY_LIMIT * 2, limit_per_host=HOST_CONNECTION_LIMIT, stats=host_stats
+    ) as session:
+        queue = Frontier(
+            budget=FETCH_BUDGET,
+            yield_lookup=QUERY_PLANNER.yield_of if QUERY_PLANNER is not None else None,
+            host_active_limit=HOST_CONNECTION_LIMIT
+        )
+        AI_CLASSIFIER = HFClassifier(session, HF_API_URL, HF_TOKEN, CRAWL_STATE, concurrency=AI_LIMIT)
 
         # Harvest
-        gh_results = await search_github_safe(session)
-        gist_results = await search_gists(session)
-        
-        for url, tag in gh_results + gist_results:
-            queue.put_nowait((url, tag, 0))
+        if crawl_from_file:
+            _, seeds = read_seeds(args.seeds)
+            if SHARD is not None:
+                total = len(seeds)
+                seeds = [seed for seed in seeds if SHARD.owns(seed[0])]
+                logger.info(f"🧩 {SHARD.name}: {len(seeds)} of {total} seeds")
+        else:
+            seeds = await harvest(session)
+            if args.harvest_only:
+                write_seeds(args.seeds, seeds, planner_counts())
+                return
+
+        for url, tag, depth, kind in seeds:
+            queue.put_nowait((url, tag, depth), kind)
             
         if queue.empty():
             logger.warning("No seeds found.")
+            await save_results()
             return
 
         # Process
+        crawl_started = time.perf_counter()
         workers = [
-            asyncio.create_task(worker(queue, session, ai_sem))
+            asyncio.create_task(worker(queue, session))
             for _ in range(CONCURRENCY_LIMIT)
         ]
         await queue.join()
         for w in workers:
             w.cancel()
+        METRICS.observe("phase_seconds", time.perf_counter() - crawl_started, phase="crawl")
+        if queue.dropped:
+            logger.info(f"💸 Fetch budget spent ({queue.fetches}). Dropped {queue.dropped} queued URLs")
+        if PROBER is not None:
+            logger.info(
+                f"🎯 Probes: {PROBER.probes_sent} guesses over {len(PROBER.started)} prefixes, "
+                f"{PROBER.sequences_stopped} cut short by misses"
+            )
 
-    # Save
-    if RESULTS_BUFFER_RU:
-        added, total = smart_merge_and_save("verified_ru.txt", RESULTS_BUFFER_RU)
-        logger.info(f"🔥 [RU] Saved {added} new sources. Total: {total}")
+    host_stats.log_summary()
+    AI_CLASSIFIER.log_summary()
 
-    if RESULTS_BUFFER_POTENTIAL:
-        added_p, total_p = smart_merge_and_save("potential_mixed.txt", RESULTS_BUFFER_POTENTIAL)
-        logger.info(f"🗂️ [MIXED] Saved {added_p} unverified sources. Total: {total_p}")
+    # Save
+    await save_results()
 
     # Stats
     logger.info("=" * 40)
@@ -840,10 +1252,12 @@ async def main():
     logger.info(f"  ⚠️  Potential:   {stats['clean_global']}")
     logger.info(f"  🗑️  Trash:       {stats['trash']}")
     logger.info(f"  🔗 Aggregators:  {stats['aggregators']}")
+    logger.info(f"  💾 Cached:      {stats['cached']}")
+    logger.info(f"  🧮 AI local/remote: {stats['ai_local']}/{stats['ai_remote']}")
     logger.info("=" * 40)
 
 if __name__ == "__main__":
     try:
         asyncio.run(main())
     except KeyboardInterrupt:
-        pass 
+        pass
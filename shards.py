@@ -0,0 +1,376 @@
+import os
+import re
+import sys
+import json
+import glob
+import time
+import zlib
+import shutil
+import logging
+import argparse
+import subprocess
+import urllib.parse
+
+from crawl_state import CrawlState, STATE_DB_FILE
+from node_store import NodeStore, NODES_DB_FILE
+from list_writer import atomic_write_lines, merge_sorted
+from query_planner import QueryPlanner
+from metrics import HISTORY_FILE
+
+logger = logging.getLogger("Shards")
+
+# --- SHARDED CRAWL ---
+# Один процесс scout делает и поиск, и обход под общим лимитом 90 минут.
+# В режиме шардов работа делится на три шага:
+#   1. harvest:  scout.py --harvest-only --seeds shards/seeds.jsonl
+#                поиск по GitHub/гистам, фронтир-затравка пишется в файл;
+#   2. crawl:    scout.py --seeds shards/seeds.jsonl --shard i/N   (N процессов/джоб)
+#                каждый шард берёт только URL своего раздела (crc32 ключа хоста),
+#                так что вежливость к хосту остаётся локальной для одного шарда.
+#                Шард работает на своих копиях crawl_state.db / nodes.db и пишет
+#                частичный результат shards/shard-i-of-N.jsonl построчно —
+#                после таймаута остаётся всё, что успели найти;
+#   3. merge:    python shards.py merge
+#                детерминированное слияние: URL сортируются, источник, все ноды
+#                которого уже встречались у предыдущих URL (зеркало), отбрасывается;
+#                списки, состояние, ноды и выхлоп дорков сливаются в основные файлы.
+# Найденные шардом URL чужого раздела откладываются (deferred_seeds.jsonl) и
+# становятся затравкой следующего запуска.
+#
+#   python shards.py local --shards 4          # всё сразу, N процессов на одной машине
+
+SHARD_DIR = "shards"
+SEEDS_FILE = "seeds.jsonl"
+DEFERRED_FILE = "deferred_seeds.jsonl"
+RU_LIST_FILE = "verified_ru.txt"
+POTENTIAL_LIST_FILE = "potential_mixed.txt"
+
+# Общие хосты раздачи: ключ шарда — хост + владелец, иначе почти весь
+# фронтир (raw.githubusercontent.com) достался бы одному шарду
+SPLIT_HOSTS = ("raw.githubusercontent.com", "gist.githubusercontent.com", "github.com", "gist.github.com")
+
+PARTIAL_REGEX = re.compile(r"shard-(\d+)-of-(\d+)\.jsonl$")
+
+
+def shard_key(url):
+    parsed = urllib.parse.urlparse(url)
+    host = parsed.netloc.lower()
+    if host in SPLIT_HOSTS:
+        owner = parsed.path.lstrip("/").split("/", 1)[0]
+        return f"{host}/{owner}"
+    return host
+
+
+def shard_of(url, count):
+    """Номер шарда URL: crc32 стабилен между процессами (в отличие от hash())."""
+    return zlib.crc32(shard_key(url).encode("utf-8")) % count
+
+
+def parse_shard(value):
+    """'i/N' -> (i, N)."""
+    try:
+        index, count = (int(x) for x in value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"shard must be i/N, got {value!r}")
+    if count < 1 or not 0 <= index < count:
+        raise argparse.ArgumentTypeError(f"shard index out of range: {value!r}")
+    return index, count
+
+
+def shard_name(index, count):
+    return f"shard-{index}-of-{count}"
+
+
+# --- SEEDS ---
+
+def write_seeds(path, seeds, planner_counts):
+    """Первая строка — выхлоп дорков за поиск (для merge), дальше по строке на URL."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    lines = [json.dumps({"planner": planner_counts, "created": int(time.time())}, ensure_ascii=False)]
+    for url, tag, depth, kind in sorted(seeds):
+        lines.append(json.dumps({"url": url, "tag": tag, "depth": depth, "kind": kind}, ensure_ascii=False))
+    atomic_write_lines(path, lines)
+    logger.info(f"🌱 {len(seeds)} seeds written to {path}")
+
+
+def read_seeds(path):
+    """(planner_counts, [(url, tag, depth, kind), ...])."""
+    planner_counts, seeds = {}, []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            entry = json.loads(line)
+            if "planner" in entry:
+                planner_counts = entry["planner"]
+            else:
+                seeds.append((entry["url"], entry["tag"], entry["depth"], entry["kind"]))
+    return planner_counts, seeds
+
+
+def load_deferred(path=DEFERRED_FILE):
+    """URL, отложенные шардами прошлого запуска, как затравка: [(url, tag, depth, kind)]."""
+    if not os.path.exists(path):
+        return []
+    seeds = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            entry = json.loads(line)
+            seeds.append((entry["url"], entry["tag"], entry["depth"], entry["kind"]))
+    os.remove(path)
+    return seeds
+
+
+# --- SHARD RESULTS ---
+
+class ShardResults:
+    """Частичный результат одного шарда: чистые источники с отпечатками нод и отложенные URL."""
+
+    def __init__(self, out_dir, index, count):
+        self.index = index
+        self.count = count
+        self.name = shard_name(index, count)
+        self.path = os.path.join(out_dir, self.name + ".jsonl")
+        self.state_path = os.path.join(out_dir, self.name + ".state.db")
+        self.nodes_path = os.path.join(out_dir, self.name + ".nodes.db")
+        self.report_path = os.path.join(out_dir, self.name + ".report.json")
+        self.deferred = set()
+        self.clean = 0
+        os.makedirs(out_dir, exist_ok=True)
+        self._file = None
+
+    def prepare(self, state_path=STATE_DB_FILE, nodes_path=NODES_DB_FILE):
+        """Копии состояния и базы нод: шарды не делят один SQLite-файл."""
+        for src, dst in ((state_path, self.state_path), (nodes_path, self.nodes_path)):
+            if os.path.exists(src):
+                shutil.copyfile(src, dst)
+            elif os.path.exists(dst):
+                os.remove(dst)
+        self._file = open(self.path, "w", encoding="utf-8")
+
+    def owns(self, url):
+        return shard_of(url, self.count) == self.index
+
+    def _write(self, entry):
+        self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def add_clean(self, url, tag, fingerprints):
+        self.clean += 1
+        self._write({"clean": url, "tag": tag, "fingerprints": list(fingerprints)})
+
+    def defer(self, item, kind):
+        url, source_tag, depth = item
+        if url in self.deferred:
+            return
+        self.deferred.add(url)
+        self._write({"defer": url, "tag": source_tag, "depth": depth, "kind": kind})
+
+    def close(self, stats, planner_counts):
+        self._write({"done": True, "stats": stats, "planner": planner_counts})
+        self._file.close()
+        logger.info(f"🧩 [{self.name}] {self.clean} clean sources, {len(self.deferred)} URL deferred")
+
+
+# --- MERGE ---
+
+def read_partial(path):
+    """(clean [(url, tag, fingerprints)], deferred [entry], done entry или None)."""
+    clean, deferred, done = [], [], None
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # Шард убит посреди записи строки
+                continue
+            if "clean" in entry:
+                clean.append((entry["clean"], entry["tag"], entry["fingerprints"]))
+            elif "defer" in entry:
+                deferred.append(entry)
+            elif entry.get("done"):
+                done = entry
+    return clean, deferred, done
+
+
+def _add_counts(total, counts):
+    for query, run in counts.items():
+        acc = total.setdefault(query, {"requests": 0, "new_urls": 0, "clean_sources": 0, "nodes": 0})
+        for key, value in run.items():
+            acc[key] += value
+
+
+def merge_shards(shard_dir=SHARD_DIR, state_path=STATE_DB_FILE, nodes_path=NODES_DB_FILE,
+                 ru_path=RU_LIST_FILE, potential_path=POTENTIAL_LIST_FILE, deferred_path=DEFERRED_FILE):
+    """Сливает частичные результаты шардов. Одинаковые входы дают одинаковый результат."""
+    partials = sorted(
+        (int(m.group(1)), int(m.group(2)), path)
+        for path in glob.glob(os.path.join(shard_dir, "shard-*-of-*.jsonl"))
+        for m in [PARTIAL_REGEX.search(path)] if m
+    )
+    if not partials:
+        logger.warning(f"No shard results in {shard_dir}")
+        return None
+    counts = {n for _, n, _ in partials}
+    if len(counts) > 1:
+        raise ValueError(f"Shard results of different splits in {shard_dir}: N={sorted(counts)}")
+    count = counts.pop()
+    missing = sorted(set(range(count)) - {i for i, _, _ in partials})
+    if missing:
+        logger.warning(f"⚠️ Missing shards {missing} of {count}")
+
+    planner_counts = {}
+    seeds_path = os.path.join(shard_dir, SEEDS_FILE)
+    if os.path.exists(seeds_path):
+        _add_counts(planner_counts, read_seeds(seeds_path)[0])
+
+    sources = {}
+    deferred = {}
+    incomplete = []
+    for index, _, path in partials:
+        clean, shard_deferred, done = read_partial(path)
+        if done is None:
+            incomplete.append(index)
+        else:
+            _add_counts(planner_counts, done["planner"])
+        for url, tag, fingerprints in clean:
+            prev = sources.get(url)
+            # Один URL у двух шардов бывает только при смене разбиения; RU важнее
+            if prev is None or (tag == "RU" and prev[0] != "RU"):
+                sources[url] = (tag, fingerprints)
+        for entry in shard_deferred:
+            deferred.setdefault(entry["defer"], entry)
+    if incomplete:
+        logger.warning(f"⚠️ Shards {incomplete} did not finish (timeout?), merging what they wrote")
+
+    # Дедупликация по отпечаткам: порядок — по URL, а не по тому, какой шард успел первым
+    seen = set()
+    ru, potential, mirrors = [], [], 0
+    for url in sorted(sources):
+        tag, fingerprints = sources[url]
+        # 304 без сохранённых отпечатков — дедуплицировать нечем, оставляем
+        if fingerprints and all(fp in seen for fp in fingerprints):
+            mirrors += 1
+            continue
+        seen.update(fingerprints)
+        (ru if tag == "RU" else potential).append(url)
+
+    ru_added, ru_total = merge_sorted(ru_path, ru)
+    potential_added, potential_total = merge_sorted(potential_path, potential)
+
+    state = CrawlState(state_path)
+    try:
+        for index, _, path in partials:
+            shard_state = os.path.join(shard_dir, shard_name(index, count) + ".state.db")
+            if os.path.exists(shard_state):
+                state.merge_from(shard_state)
+        planner = QueryPlanner(state, list(planner_counts))
+        for query, run in planner_counts.items():
+            planner.current[query].update(run)
+        planner.save()
+        state.prune()
+    finally:
+        state.close()
+
+    store = NodeStore(nodes_path)
+    try:
+        for index, _, path in partials:
+            shard_nodes = os.path.join(shard_dir, shard_name(index, count) + ".nodes.db")
+            if os.path.exists(shard_nodes):
+                store.merge_from(shard_nodes)
+        store.prune()
+    finally:
+        store.close()
+
+    # Отложенные URL, которые никто не обошёл, — затравка следующего запуска
+    pending = [
+        json.dumps({"url": url, "tag": e["tag"], "depth": e["depth"], "kind": e["kind"]}, ensure_ascii=False)
+        for url, e in sorted(deferred.items()) if url not in sources
+    ]
+    if pending:
+        atomic_write_lines(deferred_path, pending)
+    elif os.path.exists(deferred_path):
+        os.remove(deferred_path)
+
+    summary = {
+        "shards": count, "missing": missing, "incomplete": incomplete,
+        "sources": len(sources), "mirrors": mirrors,
+        "ru_added": ru_added, "ru_total": ru_total,
+        "potential_added": potential_added, "potential_total": potential_total,
+        "deferred": len(pending),
+    }
+    logger.info(
+        f"🧩 Merged {len(partials)}/{count} shards: {len(sources)} sources ({mirrors} mirrors dropped), "
+        f"RU +{ru_added} (total {ru_total}), MIXED +{potential_added} (total {potential_total}), "
+        f"{len(pending)} deferred to the next run"
+    )
+    return summary
+
+
+def _sum_into(total, values):
+    for key, value in values.items():
+        if isinstance(value, (int, float)):
+            total[key] = round(total.get(key, 0) + value, 3)
+
+
+def append_history(shard_dir, count, summary, history_path=HISTORY_FILE):
+    """Одна строка истории на запуск из отчётов шардов (как у одиночного scout)."""
+    line = {"started": None, "duration_s": 0, "phases_s": {}, "stages_s": {}, "verdicts": {}, "stats": {}}
+    for index in range(count):
+        path = os.path.join(shard_dir, shard_name(index, count) + ".report.json")
+        if not os.path.exists(path):
+            continue
+        with open(path, "r", encoding="utf-8") as f:
+            report = json.load(f)
+        line["started"] = min(filter(None, (line["started"], report["started"])))
+        line["duration_s"] = max(line["duration_s"], report["duration_s"])
+        _sum_into(line["phases_s"], {k: v["sum_s"] for k, v in report["phases"].items()})
+        _sum_into(line["stages_s"], {k: v["sum_s"] for k, v in report["stages"].items()})
+        _sum_into(line["verdicts"], report["verdicts"])
+        _sum_into(line["stats"], report.get("stats") or {})
+    line["shards"] = summary
+    with open(history_path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(line, ensure_ascii=False) + "\n")
+
+
+# --- LOCAL RUN ---
+
+def run_local(shards, shard_dir=SHARD_DIR, seeds=None):
+    """harvest (если нет готовых seeds) -> N процессов scout --shard -> merge, на одной машине."""
+    scout_py = os.path.join(os.path.dirname(os.path.abspath(__file__)), "scout.py")
+    seeds = seeds or os.path.join(shard_dir, SEEDS_FILE)
+    if not os.path.exists(seeds):
+        subprocess.run([sys.executable, scout_py, "--harvest-only", "--seeds", seeds], check=True)
+    for path in glob.glob(os.path.join(shard_dir, "shard-*")):
+        os.remove(path)
+    procs = [
+        subprocess.Popen([sys.executable, scout_py, "--seeds", seeds,
+                          "--shard", f"{i}/{shards}", "--out-dir", shard_dir])
+        for i in range(shards)
+    ]
+    failed = [i for i, proc in enumerate(procs) if proc.wait() != 0]
+    if failed:
+        logger.warning(f"⚠️ Shards {failed} exited with an error")
+    return merge_shards(shard_dir)
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s', datefmt='%H:%M:%S')
+    parser = argparse.ArgumentParser(description="Слияние и локальный запуск шардов scout")
+    sub = parser.add_subparsers(dest="command", required=True)
+    merge = sub.add_parser("merge", help="слить shards/shard-*-of-N.* в списки, состояние и nodes.db")
+    merge.add_argument("--dir", default=SHARD_DIR)
+    local = sub.add_parser("local", help="harvest + N процессов-шардов + merge")
+    local.add_argument("--shards", type=int, default=4)
+    local.add_argument("--dir", default=SHARD_DIR)
+    local.add_argument("--seeds", help="готовый файл затравки (без поиска по GitHub)")
+    args = parser.parse_args(argv)
+
+    if args.command == "merge":
+        summary = merge_shards(args.dir)
+    else:
+        summary = run_local(args.shards, args.dir, args.seeds)
+    if summary is not None:
+        append_history(args.dir, summary["shards"], summary)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+Обучение локального классификатора (classifier.py).
+
+Разметка берётся из того, что уже есть в репозитории:
+  - источники из verified_ru.txt -> "ru", из potential_mixed.txt -> "global";
+  - поверх — слабые метки по спискам ключевых слов scout.py, но только для
+    документов, где строк текста больше, чем строк со ссылками (в корпус
+    попадают лишь кандидаты, ссылки vless:// есть всегда):
+    GUIDE_KEYWORDS_HARD (2+ разных) -> "guide",
+    CONTENT_KEYWORDS_SOFT (3+ разных) -> "spam".
+    Конфиг с заголовком-инструкцией над списком нод остаётся "ru"/"global".
+Сниппет — тот же content[:700], что уходит в удалённую модель.
+
+Скачанные сниппеты кешируются в корпус (JSONL), повторное обучение сеть не трогает:
+
+    python train_classifier.py [--corpus corpus.jsonl] [--refresh] [--limit 2000]
+
+Раз в неделю модель переобучается и коммитится workflow train.yml.
+"""
+import os
+import json
+import random
+import asyncio
+import logging
+import argparse
+
+import scout
+from classifier import MODEL_FILE, fit_calibrated
+from http_client import BodyRejected, create_session, read_text_capped
+from matcher import KeywordMatcher
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s', datefmt='%H:%M:%S')
+logger = logging.getLogger("Trainer")
+
+CORPUS_FILE = "corpus.jsonl"
+FETCH_CONCURRENCY = 30
+HOLDOUT = 0.2
+
+SOURCE_LABELS = (("verified_ru.txt", "ru"), ("potential_mixed.txt", "global"))
+
+
+# Один проход по content.lower() на оба списка
+LABEL_MATCHER = KeywordMatcher({
+    "guide": scout.GUIDE_KEYWORDS_HARD,
+    "soft": scout.CONTENT_KEYWORDS_SOFT,
+})
+
+
+def is_mostly_text(content):
+    """Строк текста (со словами, без ссылок) больше, чем строк со ссылками; base64 — не текст."""
+    text_lines = link_lines = 0
+    for line in content.splitlines():
+        line = line.strip()
+        if "://" in line:
+            link_lines += 1
+        elif " " in line:
+            text_lines += 1
+    return text_lines > link_lines
+
+
+def weak_label(content, source_label):
+    if not is_mostly_text(content):
+        return source_label
+    hits = LABEL_MATCHER.scan(content.lower())
+    if len(hits.get("guide", ())) >= 2:
+        return "guide"
+    if len(hits.get("soft", ())) >= 3:
+        return "spam"
+    return source_label
+
+
+def read_sources(limit):
+    sources = []
+    for filename, label in SOURCE_LABELS:
+        if not os.path.exists(filename):
+            continue
+        with open(filename, "r", encoding="utf-8") as f:
+            urls = [line.strip() for line in f if line.strip()]
+        random.Random(0).shuffle(urls)
+        sources += [(url, label) for url in urls[:limit or None]]
+    return sources
+
+
+async def fetch_corpus(sources, corpus_path):
+    queue = asyncio.Queue()
+    for item in sources:
+        queue.put_nowait(item)
+    samples = []
+
+    async def fetch_one(session):
+        while True:
+            url, label = await queue.get()
+            try:
+                async with session.get(url, timeout=10) as resp:
+                    if resp.status == 200:
+                        content = await read_text_capped(resp, reject_arabic=True)
+                        status, data = scout.analyze_document(content, scout.clean_url(url), 0)
+                        if status == "candidate":
+                            samples.append({
+                                "url": url,
+                                "label": weak_label(content, label),
+                                "text": data["snippet"],
+                            })
+            except (BodyRejected, Exception):
+                pass
+            finally:
+                queue.task_done()
+
+    async with create_session(limit=FETCH_CONCURRENCY) as session:
+        workers = [asyncio.create_task(fetch_one(session)) for _ in range(FETCH_CONCURRENCY)]
+        await queue.join()
+        for w in workers:
+            w.cancel()
+
+    with open(corpus_path, "w", encoding="utf-8") as f:
+        for sample in samples:
+            f.write(json.dumps(sample, ensure_ascii=False) + "\n")
+    return samples
+
+
+def load_corpus(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def evaluate(model, samples):
+    correct = sum(1 for s in samples if model.predict(s["text"])[0] == s["label"])
+    return correct / len(samples) if samples else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus", default=CORPUS_FILE)
+    parser.add_argument("--refresh", action="store_true", help="перекачать корпус")
+    parser.add_argument("--limit", type=int, default=0, help="URL на каждый файл-источник (0 = все)")
+    parser.add_argument("--model", default=MODEL_FILE)
+    args = parser.parse_args()
+
+    if args.refresh or not os.path.exists(args.corpus):
+        sources = read_sources(args.limit)
+        logger.info(f"🌐 Fetching {len(sources)} sources...")
+        samples = asyncio.run(fetch_corpus(sources, args.corpus))
+    else:
+        samples = load_corpus(args.corpus)
+    if not samples:
+        logger.warning("Empty corpus, nothing to train on.")
+        return
+
+    by_label = {}
+    for s in samples:
+        by_label[s["label"]] = by_label.get(s["label"], 0) + 1
+    logger.info(f"📚 Corpus: {len(samples)} snippets {by_label}")
+
+    random.Random(0).shuffle(samples)
+    split = int(len(samples) * (1 - HOLDOUT))
+    train, test = samples[:split], samples[split:]
+    model, _ = fit_calibrated([s["text"] for s in train], [s["label"] for s in train])
+    confident = [s for s in test if model.confident(model.predict(s["text"])[1])]
+    logger.info(
+        f"🎯 Holdout accuracy: {evaluate(model, test):.1%} on {len(test)} snippets; "
+        f"confident {len(confident) / max(1, len(test)):.0%} of them, accuracy {evaluate(model, confident):.1%}"
+    )
+
+    # Финальная модель — на всём корпусе, температура и порог — по кросс-валидации
+    model, _ = fit_calibrated([s["text"] for s in samples], [s["label"] for s in samples])
+    logger.info(f"🌡️ Calibration: temperature {model.temperature:.1f}, threshold {model.threshold:.3f}")
+    model.save(args.model)
+    logger.info(f"💾 Model saved to {args.model}")
+
+
+if __name__ == "__main__":
+    main()
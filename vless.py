@@ -0,0 +1,109 @@
+import urllib.parse
+
+# --- VLESS HELPERS ---
+# Общие для scout.py и cleaner.py разборщики vless-ссылок.
+# Ссылка разбирается один раз, за один проход (partition по '#', '?', '@'
+# и '&' без регулярок), в компактную запись VlessNode. Все фильтры —
+# transport, чёрные/белые SNI, заглушки, проверка uuid — и отпечаток для
+# дедупликации работают по полям записи, а не по сырой строке.
+
+VLESS_PREFIX = "vless://"
+
+# Синонимы параметров, которые встречаются в дикой природе (ключи как есть:
+# lower() на каждый ключ — это треть времени разбора)
+_PARAM_ALIASES = (("publicKey", "pbk"), ("publickey", "pbk"), ("shortId", "sid"),
+                  ("serverName", "sni"), ("fingerprint", "fp"))
+
+
+class VlessNode:
+    __slots__ = ("uuid", "host", "port", "security", "type", "sni", "pbk", "sid", "flow", "fp", "name")
+
+    def __init__(self, uuid, host, port=0, security="", type="", sni="", pbk="", sid="",
+                 flow="", fp="", name=""):
+        self.uuid = uuid
+        self.host = host
+        self.port = port
+        self.security = security
+        self.type = type
+        self.sni = sni
+        self.pbk = pbk
+        self.sid = sid
+        self.flow = flow
+        self.fp = fp
+        self.name = name
+
+    def __repr__(self):
+        return f"VlessNode({self.uuid}@{self.host}:{self.port} {self.security}/{self.type} sni={self.sni})"
+
+    def fingerprint(self):
+        """Ключ дедупликации: uuid:pbk для reality, иначе uuid:host."""
+        return f"{self.uuid}:{self.pbk or self.host}"
+
+    def match_text(self):
+        """Поля, по которым ищутся SNI-списки: хост, sni и название ноды."""
+        return f"{self.host} {self.sni} {self.name}"
+
+    def valid_uuid(self, min_unique=5):
+        """
+        Похожий на UUID id (32-36 hex/дефисов) обязан быть 32 hex-символами
+        и не заглушкой вида 0000.../aaaa... Произвольные строки-id xray
+        допускает сам, их не трогаем.
+        """
+        raw = self.uuid.lower()
+        if not (32 <= len(raw) <= 36 and all(c in "0123456789abcdef-" for c in raw)):
+            return True
+        raw = raw.replace("-", "")
+        return len(raw) == 32 and len(set(raw)) >= min_unique
+
+
+def parse_vless(link):
+    """VlessNode или None, если это не vless-ссылка с uuid@host."""
+    if not link.startswith(VLESS_PREFIX):
+        return None
+    rest, _, name = link[len(VLESS_PREFIX):].partition("#")
+    rest, _, query = rest.partition("?")
+    uuid, at, hostport = rest.rpartition("@")
+    if not at or not uuid:
+        return None
+    hostport = hostport.rstrip("/")
+
+    if hostport.startswith("["):                       # IPv6: [::1]:443
+        host, _, port = hostport[1:].partition("]")
+        port = port[1:]
+    else:
+        host, _, port = hostport.partition(":")
+    if not host:
+        return None
+
+    params = {}
+    if query:
+        for pair in query.split("&"):
+            key, _, value = pair.partition("=")
+            params[key] = value
+        for alias, key in _PARAM_ALIASES:
+            if alias in params and key not in params:
+                params[key] = params[alias]
+
+    sni = params.get("sni", "")
+    if "%" in sni:
+        sni = urllib.parse.unquote(sni)
+
+    return VlessNode(
+        uuid,
+        host.lower(),
+        int(port) if port.isdigit() else 0,
+        params.get("security", "").lower(),
+        params.get("type", "").lower(),
+        sni.lower(),
+        params.get("pbk", ""),
+        params.get("sid", ""),
+        params.get("flow", ""),
+        params.get("fp", ""),
+        urllib.parse.unquote(name).lower() if name else "",
+    )
+
+
+def normalize_fingerprint(fp):
+    """Отпечаток без регистра и дефисов в uuid — зеркала часто переписывают ссылки."""
+    uuid, _, rest = fp.partition(":")
+    return f"{uuid.replace('-', '').lower()}:{rest.lower()}"